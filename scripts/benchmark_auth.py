@@ -0,0 +1,30 @@
+import sys
+import timeit
+from datetime import timedelta
+
+sys.path.append(".")
+
+from src.api.auth.utils import create_jwt, verify_bot_access  # noqa: E402
+from src.cache import tokens_cache  # noqa: E402
+
+NUMBER = 10000
+
+
+def verify_uncached(token: str):
+    tokens_cache.clear()
+    verify_bot_access(token)
+
+
+def main():
+    tokens = {
+        "long-lived token": create_jwt({"sub": "tgbot"}),
+        "expiring token": create_jwt({"sub": "tgbot"}, timedelta(days=1)),
+    }
+    for name, token in tokens.items():
+        before = timeit.timeit(lambda: verify_uncached(token), number=NUMBER) / NUMBER
+        after = timeit.timeit(lambda: verify_bot_access(token), number=NUMBER) / NUMBER
+        print(f"{name}: {before * 1e6:.1f} us without cache, {after * 1e6:.1f} us with cache ({before / after:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(".")
+
+# every request must reach the database, so the caches are disabled
+os.environ.update(ENTITY_CACHE_SIZE="0", DAILY_INFO_CACHE_SIZE="0", UNKNOWN_USER_CACHE_SIZE="0", WARMUP_ROOMS="0")
+
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from sqlalchemy import delete, exists, make_url, select  # noqa: E402
+
+from src.api.auth.utils import create_jwt  # noqa: E402
+from src.config import get_settings  # noqa: E402
+from src.db_sessions.sqlalchemy_session import session_maker  # noqa: E402
+from src.main import app  # noqa: E402
+from src.models.sql import User, Room, Order, Task, TaskExecutor, ManualTask, Rule  # noqa: E402
+
+DRIVERS = ["psycopg", "asyncpg"]
+REQUESTS = 1000
+CONCURRENCY = 10
+ROOMS = 10
+USERS_PER_ROOM = 5
+# ids of the benchmark's rows; user ids are Telegram ids, which no range is guaranteed to avoid,
+# so the benchmark only runs on a database without other rooms and users, see `is_dedicated_database`
+BASE_ID = 900_000
+ROOM_IDS = range(BASE_ID, BASE_ID + ROOMS)
+USER_IDS = range(BASE_ID, BASE_ID + ROOMS * USERS_PER_ROOM)
+
+TOKEN = create_jwt({"sub": "tgbot"}, timedelta(hours=1))
+
+
+def endpoints(user_id: int) -> list[tuple[str, str, dict | None]]:
+    room_id = BASE_ID + (user_id - BASE_ID) // USERS_PER_ROOM
+    return [
+        ("GET", "/bot/room/daily_info", None),
+        ("GET", "/bot/room/info", None),
+        ("GET", "/bot/room/list_of_orders", None),
+        ("GET", "/bot/task/list", None),
+        ("GET", f"/bot/task/info/{room_id}", None),
+        ("GET", "/bot/rule/list", None),
+        ("POST", "/bot/manual_task/do", {"user_id": user_id, "task_id": room_id}),
+    ]
+
+
+async def setup_data():
+    async with session_maker.get_session() as db:
+        # the models have no relationships, so the rows are flushed in the order of the foreign keys
+        db.add_all(Room(room_id, f"room{room_id}") for room_id in ROOM_IDS)
+        await db.flush()
+        for room_id in ROOM_IDS:
+            db.add(Order(room_id, room_id))
+            for user_id in room_users(room_id):
+                db.add(User(user_id, room_id, f"alias{user_id}", f"fullname{user_id}"))
+        await db.flush()
+        for room_id in ROOM_IDS:
+            for i, user_id in enumerate(room_users(room_id)):
+                db.add(TaskExecutor(user_id, room_id, i))
+            db.add(Task(room_id, "task", "description", room_id, datetime.now() - timedelta(days=3), 2, room_id))
+            db.add(ManualTask(room_id, room_id, "manual task", "description", 0, room_id))
+            db.add(Rule(room_id, "rule", "text", room_id))
+        await db.commit()
+
+
+def room_users(room_id: int) -> range:
+    first = BASE_ID + (room_id - BASE_ID) * USERS_PER_ROOM
+    return range(first, first + USERS_PER_ROOM)
+
+
+async def is_dedicated_database() -> bool:
+    """True if the database has no rooms and users but the benchmark's, which it creates and deletes."""
+    async with session_maker.get_session() as db:
+        return not await db.scalar(
+            select(exists().where(Room.id.not_in(ROOM_IDS)) | exists().where(User.id.not_in(USER_IDS)))
+        )
+
+
+async def clear_data():
+    async with session_maker.get_session() as db:
+        await db.execute(delete(Room).where(Room.id.in_(ROOM_IDS)))
+        await db.execute(delete(User).where(User.id.in_(USER_IDS)))
+        await db.commit()
+
+
+async def measure(client: AsyncClient, endpoint: int) -> tuple[list[float], float]:
+    """Send REQUESTS requests to the endpoint from CONCURRENCY clients; returns the latencies and the total time."""
+    latencies = []
+    users = list(USER_IDS)
+
+    async def worker(worker_id: int):
+        for i in range(worker_id, REQUESTS, CONCURRENCY):
+            user_id = users[i % len(users)]
+            method, url, body = endpoints(user_id)[endpoint]
+            headers = {"X-Token": TOKEN, "X-User-Id": str(user_id)}
+            start = time.perf_counter()
+            r = await client.request(method, url, json=body, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(CONCURRENCY)))
+    return latencies, time.perf_counter() - start
+
+
+async def benchmark(driver: str):
+    url = make_url(get_settings().DB_URL).set(drivername=f"postgresql+{driver}").render_as_string(hide_password=False)
+    session_maker.start(url)
+    try:
+        if not await is_dedicated_database():
+            sys.exit("The database has other rooms or users, run the benchmark on a dedicated database")
+        await clear_data()
+        try:
+            await setup_data()
+            async with AsyncClient(transport=ASGITransport(app), base_url="http://test") as client:
+                for endpoint in range(len(endpoints(BASE_ID))):
+                    # the first requests of each connection prepare the statements
+                    await measure(client, endpoint)
+                    latencies, elapsed = await measure(client, endpoint)
+                    method, url, _ = endpoints(BASE_ID)[endpoint]
+                    quantiles = statistics.quantiles(latencies, n=20)
+                    p50, p95 = quantiles[9] * 1e3, quantiles[18] * 1e3
+                    print(
+                        f"{driver:8} {method:4} {url:30} "
+                        f"p50 {p50:6.2f} ms, p95 {p95:6.2f} ms, {len(latencies) / elapsed:7.0f} requests/s"
+                    )
+        finally:
+            await clear_data()
+    finally:
+        await session_maker.dispose()
+
+
+async def main():
+    for driver in DRIVERS:
+        await benchmark(driver)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,11 +3,13 @@ import sys
 
 sys.path.append(".")
 
-from tests.test_methods import clear_db
+from src.db_sessions.sqlalchemy_session import session_maker  # noqa: E402
+from tests.test_methods import clear_db  # noqa: E402
 
 
 async def main():
     await clear_db()
+    await session_maker.dispose()
 
 
 if __name__ == "__main__":
@@ -12,6 +12,7 @@ from src.api.exceptions import (
     TokenExpiredException,
     InvalidTokenException,
 )
+from src.cache import tokens_cache
 from src.config import get_settings
 
 settings = get_settings()
@@ -28,10 +29,23 @@ def create_jwt(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 
-def decode_jwt(token: str):
-    payload = jwt.decode(token, settings.SECRET_KEY, settings.TOKEN_ALGORITHM)
+def check_jwt_expiration(payload: dict):
     if "expire" not in payload or payload["expire"] < datetime.utcnow().timestamp() and payload["expire"] != -1:
         raise ExpiredSignatureError()
+
+
+def decode_jwt(token: str):
+    payload = jwt.decode(token, settings.SECRET_KEY, settings.TOKEN_ALGORITHM)
+    check_jwt_expiration(payload)
+    return payload
+
+
+def decode_jwt_cached(token: str):
+    # only the signature verification is cached, the expiration is checked on every use
+    if (payload := tokens_cache.get(token)) is None:
+        payload = jwt.decode(token, settings.SECRET_KEY, settings.TOKEN_ALGORITHM)
+        tokens_cache.set(token, payload)
+    check_jwt_expiration(payload)
     return payload
 
 
@@ -39,7 +53,7 @@ def verify_bot_access(x_token: Annotated[str | None, Header()] = None):
     if x_token is None:
         raise NoTokenException()
     try:
-        data = decode_jwt(x_token)
+        data = decode_jwt_cached(x_token)
         if not data["sub"] == "tgbot":
             raise TelegramBotAccessException()
         return True
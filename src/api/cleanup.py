@@ -0,0 +1,22 @@
+import asyncio
+
+from src.api.utils import delete_expired_invitations
+from src.config import get_settings
+from src.db_sessions.sqlalchemy_session import session_maker
+
+
+async def delete_all_expired_invitations():
+    async with session_maker.get_session() as db:
+        await delete_expired_invitations(None, db)
+        await db.commit()
+
+
+async def clean_up_periodically():
+    """Delete the expired invitations of all senders every INVITATION_CLEANUP_INTERVAL seconds until cancelled."""
+    settings = get_settings()
+    while True:
+        await asyncio.sleep(settings.INVITATION_CLEANUP_INTERVAL)
+        try:
+            await delete_all_expired_invitations()
+        except Exception as e:
+            print(f"Invitations cleanup failed: {e!r}")
@@ -1,9 +1,14 @@
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
-from src.api.exceptions import MyException
+from src.api.exceptions import MyException, NotModifiedException
 
 
 # noinspection PyUnusedLocal
 async def error_printing(request, exception: MyException):
     print(exception)
     return JSONResponse(exception.detail, exception.status_code, exception.headers)
+
+
+# noinspection PyUnusedLocal
+async def not_modified(request, exception: NotModifiedException):
+    return Response(status_code=exception.status_code, headers=exception.headers)
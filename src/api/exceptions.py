@@ -6,6 +6,11 @@ class MyException(HTTPException):
         super().__init__(http_code, {"code": code, "detail": details})
 
 
+class NotModifiedException(HTTPException):
+    def __init__(self, etag: str, headers: dict[str, str] | None = None):
+        super().__init__(status.HTTP_304_NOT_MODIFIED, headers={**(headers or {}), "ETag": etag})
+
+
 """
 Token errors
 """
@@ -8,6 +8,7 @@ from .rule import router as rule_router
 from .periodic_task import router as task_router
 from .user import router as user_router
 from .manual_task import router as manual_task_router
+from .batch import router as batch_router
 
 bot_router = APIRouter(prefix="/bot", dependencies=[BOT_ACCESS_DEPENDENCY])
 
@@ -18,3 +19,4 @@ bot_router.include_router(order_router)
 bot_router.include_router(invitation_router)
 bot_router.include_router(rule_router)
 bot_router.include_router(manual_task_router)
+bot_router.include_router(batch_router)
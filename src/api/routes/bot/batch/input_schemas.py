@@ -0,0 +1,8 @@
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+
+class BatchOperation(BaseModel):
+    path: str = Field(pattern=r"^/\w+/\w+$", description="path of a bot route without the /bot prefix, e.g. /room/info")
+    body: dict[str, Any] = Field(default_factory=dict, description="JSON body of the route")
@@ -0,0 +1,13 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class BatchOperationResult(BaseModel):
+    status_code: int
+    result: Any = None
+    error: Any = None
+
+
+class BatchResponse(BaseModel):
+    results: list[BatchOperationResult]
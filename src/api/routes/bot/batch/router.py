@@ -0,0 +1,112 @@
+import json
+from typing import Annotated
+
+from fastapi import APIRouter, Body, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import apply_invalidations
+from src.db_sessions.replicas import pin_to_primary
+from src.db_sessions.sqlalchemy_session import session_maker
+from .input_schemas import BatchOperation
+from .output_schemas import BatchOperationResult, BatchResponse
+
+router = APIRouter(prefix="/batch")
+
+MAX_BATCH_OPERATIONS = 20
+
+
+class _RollbackBatch(Exception):
+    pass
+
+
+async def execute_operation(request: Request, operation: BatchOperation, db: AsyncSession) -> BatchOperationResult:
+    """Run a bot route in-process as a sub-request of `request` sharing the session `db`."""
+    path = f"/bot{operation.path}"
+    body = json.dumps(operation.body).encode()
+    headers = [(k, v) for k, v in request.scope["headers"] if k == b"x-token"]
+    headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": "POST",
+        "scheme": request.scope.get("scheme", "http"),
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": headers,
+        "state": {"db_session": db},
+    }
+
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if request_sent:
+            return {"type": "http.disconnect"}
+        request_sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    status_code = 500
+    response_body = b""
+
+    async def send(message):
+        nonlocal status_code, response_body
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message["type"] == "http.response.body":
+            response_body += message.get("body", b"")
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception as e:
+        # the server error middleware has already sent a plain-text 500 and re-raised the exception
+        print(f"Batch operation {operation.path} failed: {e!r}")
+        return BatchOperationResult(status_code=500, error="Internal Server Error")
+
+    content = json.loads(response_body) if response_body else None
+    if status_code >= 400:
+        return BatchOperationResult(status_code=status_code, error=content)
+    return BatchOperationResult(status_code=status_code, result=content)
+
+
+@router.post("", response_description="Results of the operations in the order of execution")
+async def execute_batch(
+    request: Request,
+    operations: Annotated[list[BatchOperation], Body(embed=True, min_length=1, max_length=MAX_BATCH_OPERATIONS)],
+    atomic: Annotated[bool, Body(embed=True, description="run all operations in one transaction")] = False,
+) -> BatchResponse:
+    response = BatchResponse(results=[])
+
+    if atomic:
+        # the first failed operation stops the batch and rolls back the whole transaction
+        db = None
+        try:
+            async with session_maker.get_transaction_session() as db:
+                for operation in operations:
+                    response.results.append(result := await execute_operation(request, operation, db))
+                    if result.error is not None:
+                        raise _RollbackBatch()
+        except _RollbackBatch:
+            pass
+        finally:
+            # commits of the operations only release savepoints, so the caches are invalidated
+            # when the outer transaction ends
+            if db is not None:
+                await apply_invalidations(db)
+                if session_maker.has_replicas:
+                    await pin_to_primary(db)
+        return response
+
+    async with session_maker.get_session() as db:
+        for operation in operations:
+            response.results.append(result := await execute_operation(request, operation, db))
+            if result.error is not None:
+                await db.rollback()
+            await apply_invalidations(db)
+        if session_maker.has_replicas:
+            await pin_to_primary(db)
+    return response
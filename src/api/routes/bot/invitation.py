@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Iterable
+from typing import Annotated
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, Response
 from sqlalchemy import select, exists, func
 from sqlalchemy.sql.functions import count
 
@@ -16,10 +16,17 @@ from src.api.exceptions import (
 from src.api.utils import (
     USER_DEPENDENCY,
     ROOM_DEPENDENCY,
+    HEADER_USER_DEPENDENCY,
+    CACHE_CONTROL_DEPENDENCY,
+    check_content_etag,
     check_invitation_exists,
+    delete_expired_invitations,
+    invalidate_cached,
+    touch_room,
 )
+from src.cache import users_cache
 from src.config import SETTINGS_DEPENDENCY
-from src.db_sessions import DB_SESSION_DEPENDENCY
+from src.db_sessions import DB_SESSION_DEPENDENCY, read_only
 from src.models.sql import User, Room, Invitation
 from src.schemas.method_input_schemas import (
     InvitePersonBody,
@@ -46,6 +53,7 @@ async def invite_person(
     db: DB_SESSION_DEPENDENCY,
     settings: SETTINGS_DEPENDENCY,
 ) -> int:
+    await delete_expired_invitations(user.id, db)
     number_of_invitations = (
         await db.execute(select(count()).select_from(Invitation).where(Invitation.sender_id == user.id))
     ).scalar()
@@ -63,6 +71,7 @@ async def invite_person(
 
     invite = Invitation(sender_id=user.id, addressee_alias=addressee.alias, room_id=room.id)
     db.add(invite)
+    await touch_room(room.id, db)
     await db.commit()
 
     return invite.id
@@ -86,61 +95,94 @@ async def accept_invitation(user: USER_DEPENDENCY, invitation: AcceptInvitationB
 
     user.room_id = invitation.room_id
     await db.delete(invitation)
+    await touch_room(invitation.room_id, db)
+    invalidate_cached(db, users_cache, user.id)
     await db.commit()
 
     return invitation.room_id
 
 
 @router.post("/inbox", response_description="A list of the invitations addressed to a user")
+@read_only
 async def get_incoming_invitations(user: USER_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> IncomingInvitationsResponse:
     response = IncomingInvitationsResponse(invitations=[])
     if user.alias is None:
         return response
 
-    invitations: Iterable[Invitation] = (
-        await db.scalars(select(Invitation).where(func.lower(Invitation.addressee_alias) == user.alias.lower()))
-        if user.alias is not None
-        else []
+    rows = await db.execute(
+        select(Invitation.id, Invitation.room_id, Room.name, User.id.label("sender_id"), User.alias, User.fullname)
+        .select_from(Invitation)
+        .join(Room, Room.id == Invitation.room_id)
+        .join(User, User.id == Invitation.sender_id)
+        .where(
+            func.lower(Invitation.addressee_alias) == user.alias.lower(), Invitation.expiration_date > datetime.now()
+        )
     )
-    for i in invitations:
-        if i.expiration_date <= datetime.now():
-            await db.delete(i)
-            continue
-        room_name = (await db.get_one(Room, i.room_id)).name
-        sender: User = await db.get_one(User, i.sender_id)
+    for row in rows:
         response.invitations.append(
             IncomingInvitationInfo(
-                id=i.id,
-                sender=UserInfo.model_validate(sender, from_attributes=True),
-                room=i.room_id,
-                room_name=room_name,
+                id=row.id,
+                sender=UserInfo(id=row.sender_id, alias=row.alias, fullname=row.fullname),
+                room=row.room_id,
+                room_name=row.name,
             )
         )
 
-    await db.commit()
     return response
 
 
+@router.get(
+    "/inbox",
+    response_description="A list of the invitations addressed to a user",
+    dependencies=[CACHE_CONTROL_DEPENDENCY],
+)
+@read_only
+async def read_incoming_invitations(
+    user: HEADER_USER_DEPENDENCY,
+    response: Response,
+    db: DB_SESSION_DEPENDENCY,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> IncomingInvitationsResponse:
+    invitations = await get_incoming_invitations(user=user, db=db)
+    check_content_etag(invitations, response, if_none_match)
+    return invitations
+
+
 @router.post("/sent", response_description="The list of sent invitations")
+@read_only
 async def get_sent_invitations(user: USER_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> SentInvitationsResponse:
-    invitations: list[SentInvitationInfo] = []
-    i: Invitation
-    for i in await db.scalars(select(Invitation).where(Invitation.sender_id == user.id)):
-        if i.expiration_date <= datetime.now():
-            await db.delete(i)
-            continue
-        room_name = (await db.get_one(Room, i.room_id)).name
-        invitations.append(
-            SentInvitationInfo(id=i.id, addressee=i.addressee_alias, room=i.room_id, room_name=room_name)
-        )
+    rows = await db.execute(
+        select(Invitation.id, Invitation.addressee_alias, Invitation.room_id, Room.name)
+        .select_from(Invitation)
+        .join(Room, Room.id == Invitation.room_id)
+        .where(Invitation.sender_id == user.id, Invitation.expiration_date > datetime.now())
+    )
+    invitations = [
+        SentInvitationInfo(id=row.id, addressee=row.addressee_alias, room=row.room_id, room_name=row.name)
+        for row in rows
+    ]
 
     return SentInvitationsResponse(invitations=invitations)
 
 
+@router.get("/sent", response_description="The list of sent invitations", dependencies=[CACHE_CONTROL_DEPENDENCY])
+@read_only
+async def read_sent_invitations(
+    user: HEADER_USER_DEPENDENCY,
+    response: Response,
+    db: DB_SESSION_DEPENDENCY,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> SentInvitationsResponse:
+    invitations = await get_sent_invitations(user=user, db=db)
+    check_content_etag(invitations, response, if_none_match)
+    return invitations
+
+
 @router.post("/delete", response_description="True if the invitation was deleted")
 async def delete_invitation(user: USER_DEPENDENCY, invitation: DeleteInvitationBody, db: DB_SESSION_DEPENDENCY) -> bool:
     invitation = await check_invitation_exists(invitation.id, user.id, db)
     await db.delete(invitation)
+    await touch_room(invitation.room_id, db)
     await db.commit()
 
     return True
@@ -156,6 +198,7 @@ async def reject_invitation(user: USER_DEPENDENCY, invitation: RejectInvitationB
         raise NotYoursInvitationException()
 
     await db.delete(invitation)
+    await touch_room(invitation.room_id, db)
     await db.commit()
 
     return True
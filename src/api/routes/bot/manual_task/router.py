@@ -10,11 +10,15 @@ from src.api.exceptions import (
 )
 from src.api.utils import (
     ROOM_DEPENDENCY,
+    HEADER_ROOM_DEPENDENCY,
+    HEADER_ROOM_ETAG_DEPENDENCY,
+    CACHE_CONTROL_DEPENDENCY,
+    touch_room,
     check_order_exists,
     check_manual_task_exists,
 )
 from src.config import SETTINGS_DEPENDENCY
-from src.db_sessions import DB_SESSION_DEPENDENCY
+from src.db_sessions import DB_SESSION_DEPENDENCY, read_only
 from src.models.sql import ManualTask, TaskExecutor, User
 from src.schemas.method_output_schemas import TaskCurrent, UserInfo
 from .input_schemas import (
@@ -47,6 +51,7 @@ async def create_manual_task(
         task_obj.order_id = order.id
     db.add(task_obj)
 
+    await touch_room(room.id, db)
     await db.commit()
 
     return task_obj.id
@@ -62,6 +67,7 @@ async def modify_manual_task(room: ROOM_DEPENDENCY, task: ModifyManualTaskBody,
                 await check_order_exists(value, room.id, db)
                 task_obj.counter = 0
             setattr(task_obj, param, value)
+    await touch_room(room.id, db)
     await db.commit()
 
 
@@ -74,10 +80,12 @@ async def remove_manual_task_parameters(
     for param in ("description", "order_id"):
         if getattr(task, param):
             setattr(task_obj, param, None)
+    await touch_room(room.id, db)
     await db.commit()
 
 
 @router.post("/list", response_description="The full list of a room's tasks")
+@read_only
 async def get_manual_tasks(room: ROOM_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> ManualTaskListResponse:
     response = ManualTaskListResponse(tasks=[])
     tasks: Iterable[ManualTask] = await db.scalars(select(ManualTask).where(ManualTask.room_id == room.id))
@@ -87,7 +95,18 @@ async def get_manual_tasks(room: ROOM_DEPENDENCY, db: DB_SESSION_DEPENDENCY) ->
     return response
 
 
+@router.get(
+    "/list",
+    response_description="The full list of a room's tasks",
+    dependencies=[CACHE_CONTROL_DEPENDENCY, HEADER_ROOM_ETAG_DEPENDENCY],
+)
+@read_only
+async def read_manual_tasks(room: HEADER_ROOM_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> ManualTaskListResponse:
+    return await get_manual_tasks(room=room, db=db)
+
+
 @router.post("/info", response_description="The task's details")
+@read_only
 async def get_manual_task_info(
     room: ROOM_DEPENDENCY, task_id: Annotated[int, Body()], db: DB_SESSION_DEPENDENCY
 ) -> ManualTaskInfoResponse:
@@ -101,10 +120,23 @@ async def get_manual_task_info(
     return response
 
 
+@router.get(
+    "/info/{task_id}",
+    response_description="The task's details",
+    dependencies=[CACHE_CONTROL_DEPENDENCY, HEADER_ROOM_ETAG_DEPENDENCY],
+)
+@read_only
+async def read_manual_task_info(
+    room: HEADER_ROOM_DEPENDENCY, task_id: int, db: DB_SESSION_DEPENDENCY
+) -> ManualTaskInfoResponse:
+    return await get_manual_task_info(room=room, task_id=task_id, db=db)
+
+
 @router.post("/delete")
 async def delete_manual_task(room: ROOM_DEPENDENCY, task_id: Annotated[int, Body()], db: DB_SESSION_DEPENDENCY) -> None:
     task: ManualTask = await check_manual_task_exists(task_id, room.id, db)
     await db.delete(task)
+    await touch_room(room.id, db)
     await db.commit()
 
 
@@ -115,10 +147,12 @@ async def do_manual_task(room: ROOM_DEPENDENCY, task_id: Annotated[int, Body()],
         raise ManualTaskIsInactiveException()
     executor_count = await db.scalar(select(count()).where(TaskExecutor.order_id == task.order_id))
     task.counter = (task.counter + 1) % executor_count
+    await touch_room(room.id, db)
     await db.commit()
 
 
 @router.post("/current_executor")
+@read_only
 async def get_current_executor(
     room: ROOM_DEPENDENCY, task_id: Annotated[int, Body()], db: DB_SESSION_DEPENDENCY
 ) -> ManualTaskCurrentResponse:
@@ -133,3 +167,11 @@ async def get_current_executor(
             number=task.counter, user=UserInfo(id=current.id, alias=current.alias, fullname=current.fullname)
         )
     )
+
+
+@router.get("/current_executor/{task_id}", dependencies=[CACHE_CONTROL_DEPENDENCY, HEADER_ROOM_ETAG_DEPENDENCY])
+@read_only
+async def read_current_executor(
+    room: HEADER_ROOM_DEPENDENCY, task_id: int, db: DB_SESSION_DEPENDENCY
+) -> ManualTaskCurrentResponse:
+    return await get_current_executor(room=room, task_id=task_id, db=db)
@@ -1,7 +1,7 @@
 from typing import Annotated, Iterable
 
 from fastapi import APIRouter, Body
-from sqlalchemy import select, exists
+from sqlalchemy import select, exists, insert
 from sqlalchemy.sql.functions import count
 
 from src.api.exceptions import (
@@ -11,10 +11,14 @@ from src.api.exceptions import (
 )
 from src.api.utils import (
     ROOM_DEPENDENCY,
+    HEADER_ROOM_DEPENDENCY,
+    HEADER_ROOM_ETAG_DEPENDENCY,
+    CACHE_CONTROL_DEPENDENCY,
+    touch_room,
     check_order_exists,
 )
 from src.config import SETTINGS_DEPENDENCY
-from src.db_sessions import DB_SESSION_DEPENDENCY
+from src.db_sessions import DB_SESSION_DEPENDENCY, read_only
 from src.models.sql import User, TaskExecutor, Order, Task
 from src.schemas.method_input_schemas import (
     CreateOrderBody,
@@ -37,28 +41,31 @@ async def create_order(
     if number_of_orders >= settings.MAX_ORDERS:
         raise TooManyOrdersException()
 
-    order_list = []
-    for i, user_id in enumerate(order.users):
-        user = await db.get(User, user_id)
-        if user is None:
+    user_rooms: dict[int, int | None] = dict(
+        (await db.execute(select(User.id, User.room_id).where(User.id.in_(order.users)))).tuples().all()
+    )
+    for user_id in order.users:
+        if user_id not in user_rooms:
             raise SpecifiedUserNotExistException(user_id)
-        order_list.append(user)
-        if user.room_id != room.id:
+        if user_rooms[user_id] != room.id:
             raise SpecifiedUserNotInRoomException(user_id)
 
-    order = Order(room_id=room.id)
-    db.add(order)
-    await db.flush()
-    for i, user in enumerate(order_list):
-        executor = TaskExecutor(user_id=user.id, order_id=order.id, order_number=i)
-        db.add(executor)
+    order_id: int = await db.scalar(insert(Order).values(room_id=room.id).returning(Order.id))
+    if order.users:
+        await db.execute(
+            insert(TaskExecutor).values(
+                [{"user_id": user_id, "order_id": order_id, "order_number": i} for i, user_id in enumerate(order.users)]
+            )
+        )
 
+    await touch_room(room.id, db)
     await db.commit()
 
-    return order.id
+    return order_id
 
 
 @router.post("/info", response_description="The information about the order")
+@read_only
 async def get_order_info(room: ROOM_DEPENDENCY, order: OrderInfoBody, db: DB_SESSION_DEPENDENCY) -> OrderInfoResponse:
     order = await check_order_exists(order.id, room.id, db)
 
@@ -73,17 +80,39 @@ async def get_order_info(room: ROOM_DEPENDENCY, order: OrderInfoBody, db: DB_SES
     return OrderInfoResponse(users=[UserInfo.model_validate(u, from_attributes=True) for u in users])
 
 
+@router.get(
+    "/info/{order_id}",
+    response_description="The information about the order",
+    dependencies=[CACHE_CONTROL_DEPENDENCY, HEADER_ROOM_ETAG_DEPENDENCY],
+)
+@read_only
+async def read_order_info(room: HEADER_ROOM_DEPENDENCY, order_id: int, db: DB_SESSION_DEPENDENCY) -> OrderInfoResponse:
+    return await get_order_info(room=room, order=OrderInfoBody(id=order_id), db=db)
+
+
 @router.post("/delete", response_description="True if the order was deleted")
 async def delete_order(room: ROOM_DEPENDENCY, order_id: Annotated[int, Body()], db: DB_SESSION_DEPENDENCY) -> bool:
     order: Order = await check_order_exists(order_id, room.id, db)
     await db.delete(order)
+    await touch_room(room.id, db)
     await db.commit()
     return True
 
 
 @router.post("/is_in_use", response_description="True if the order is used in some tasks")
+@read_only
 async def is_order_in_use(room: ROOM_DEPENDENCY, order_id: Annotated[int, Body()], db: DB_SESSION_DEPENDENCY) -> bool:
     await check_order_exists(order_id, room.id, db)
     if (await db.execute(select(exists(Task)).where(Task.order_id == order_id))).scalar():
         return True
     return False
+
+
+@router.get(
+    "/is_in_use/{order_id}",
+    response_description="True if the order is used in some tasks",
+    dependencies=[CACHE_CONTROL_DEPENDENCY, HEADER_ROOM_ETAG_DEPENDENCY],
+)
+@read_only
+async def read_order_in_use(room: HEADER_ROOM_DEPENDENCY, order_id: int, db: DB_SESSION_DEPENDENCY) -> bool:
+    return await is_order_in_use(room=room, order_id=order_id, db=db)
@@ -1,8 +1,9 @@
 from datetime import datetime
 from typing import Annotated, Iterable
 
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, Response
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.functions import count
 
 from src.api.exceptions import (
@@ -10,12 +11,17 @@ from src.api.exceptions import (
 )
 from src.api.utils import (
     ROOM_DEPENDENCY,
+    HEADER_ROOM_DEPENDENCY,
+    CACHE_CONTROL_DEPENDENCY,
+    EXPIRING_ROOM_ETAG_DEPENDENCY,
+    room_etag,
+    touch_room,
     check_order_exists,
     check_task_exists,
 )
 from src.config import SETTINGS_DEPENDENCY
-from src.db_sessions import DB_SESSION_DEPENDENCY
-from src.models.sql import Task
+from src.db_sessions import DB_SESSION_DEPENDENCY, read_only
+from src.models.sql import Room, Task
 from src.models.sql.task_executor import TaskExecutor
 from src.models.sql.user import User
 from src.schemas.method_output_schemas import UserInfo, TaskCurrent
@@ -53,6 +59,7 @@ async def create_task(
         task_obj.order_id = None
     db.add(task_obj)
 
+    await touch_room(room.id, db)
     await db.commit()
 
     return task_obj.id
@@ -67,6 +74,7 @@ async def modify_task(room: ROOM_DEPENDENCY, task: ModifyTaskBody, db: DB_SESSIO
             if param == "order_id" and value is not None:
                 await check_order_exists(value, room.id, db)
             setattr(task_obj, param, value)
+    await touch_room(room.id, db)
     await db.commit()
 
     return True
@@ -81,23 +89,48 @@ async def remove_task_parameters(
     for param in ("description", "order_id"):
         if getattr(task, param):
             setattr(task_obj, param, None)
+    await touch_room(room.id, db)
     await db.commit()
 
     return True
 
 
 @router.post("/list", response_description="The full list of a room's tasks")
+@read_only
 async def get_tasks(room: ROOM_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> TaskListResponse:
+    response, _ = await list_tasks(room, db, datetime.now())
+    return response
+
+
+async def list_tasks(room: Room, db: AsyncSession, now: datetime) -> tuple[TaskListResponse, datetime | None]:
+    """The response of `get_tasks` at `now` with the moment when it expires, None if only the room's changes do."""
     response = TaskListResponse(tasks=[])
+    expires_at = None
     tasks: Iterable[Task] = await db.scalars(select(Task).where(Task.room_id == room.id))
     for task in tasks:
-        inactive = task.is_inactive()
+        inactive = task.order_id is None or task.start_date > now
         response.tasks.append(TaskInfo(id=task.id, name=task.name, inactive=inactive))
+        # a task with an order becomes active on its start date
+        if task.order_id is not None and task.start_date > now:
+            expires_at = task.start_date if expires_at is None else min(expires_at, task.start_date)
 
-    return response
+    return response, expires_at
+
+
+@router.get(
+    "/list",
+    response_description="The full list of a room's tasks",
+    dependencies=[CACHE_CONTROL_DEPENDENCY, EXPIRING_ROOM_ETAG_DEPENDENCY],
+)
+@read_only
+async def read_tasks(room: HEADER_ROOM_DEPENDENCY, response: Response, db: DB_SESSION_DEPENDENCY) -> TaskListResponse:
+    tasks, expires_at = await list_tasks(room, db, datetime.now())
+    response.headers["ETag"] = room_etag(room, expires_at)
+    return tasks
 
 
 @router.post("/info", response_description="The task's details")
+@read_only
 async def get_task_info(room: ROOM_DEPENDENCY, task: TaskInfoBody, db: DB_SESSION_DEPENDENCY) -> TaskInfoResponse:
     task: Task = await check_task_exists(task.id, room.id, db)
     response = TaskInfoResponse(
@@ -112,24 +145,47 @@ async def get_task_info(room: ROOM_DEPENDENCY, task: TaskInfoBody, db: DB_SESSIO
     return response
 
 
+@router.get(
+    "/info/{task_id}",
+    response_description="The task's details",
+    dependencies=[CACHE_CONTROL_DEPENDENCY, EXPIRING_ROOM_ETAG_DEPENDENCY],
+)
+@read_only
+async def read_task_info(
+    room: HEADER_ROOM_DEPENDENCY, task_id: int, response: Response, db: DB_SESSION_DEPENDENCY
+) -> TaskInfoResponse:
+    now = datetime.now()
+    info = await get_task_info(room=room, task=TaskInfoBody(id=task_id), db=db)
+    # the task becomes active on its start date
+    expires_at = info.start_date if info.order_id is not None and info.start_date > now else None
+    response.headers["ETag"] = room_etag(room, expires_at)
+    return info
+
+
 @router.post("/delete", response_description="True if the task was deleted")
 async def delete_task(room: ROOM_DEPENDENCY, task_id: Annotated[int, Body()], db: DB_SESSION_DEPENDENCY) -> bool:
     task: Task = await check_task_exists(task_id, room.id, db)
     await db.delete(task)
+    await touch_room(room.id, db)
     await db.commit()
     return True
 
 
 @router.post("/current_executor")
+@read_only
 async def get_current_executor(
     room: ROOM_DEPENDENCY, task_id: Annotated[int, Body()], db: DB_SESSION_DEPENDENCY
 ) -> TaskCurrentResponse:
     task: Task = await check_task_exists(task_id, room.id, db)
-    if task.is_inactive() or not task.is_today_duty(datetime.now()):
+    return await find_current_executor(task, db, datetime.now())
+
+
+async def find_current_executor(task: Task, db: AsyncSession, now: datetime) -> TaskCurrentResponse:
+    if task.order_id is None or task.start_date > now or not task.is_today_duty(now):
         return TaskCurrentResponse(current=None)
 
     executors_count: int = await db.scalar(select(count()).where(TaskExecutor.order_id == task.order_id))
-    executor_index: int = task.get_today_executor_index(datetime.now(), executors_count)
+    executor_index: int = task.get_today_executor_index(now, executors_count)
     executor: TaskExecutor = await db.get_one(TaskExecutor, (task.order_id, executor_index))
     current: User = await db.get_one(User, executor.user_id)
     return TaskCurrentResponse(
@@ -137,3 +193,15 @@ async def get_current_executor(
             number=executor_index, user=UserInfo(id=current.id, alias=current.alias, fullname=current.fullname)
         )
     )
+
+
+@router.get("/current_executor/{task_id}", dependencies=[CACHE_CONTROL_DEPENDENCY, EXPIRING_ROOM_ETAG_DEPENDENCY])
+@read_only
+async def read_current_executor(
+    room: HEADER_ROOM_DEPENDENCY, task_id: int, response: Response, db: DB_SESSION_DEPENDENCY
+) -> TaskCurrentResponse:
+    task: Task = await check_task_exists(task_id, room.id, db)
+    now = datetime.now()
+    # the executor changes at the start of each day of the task, a task without an order never changes by itself
+    response.headers["ETag"] = room_etag(room, task.get_next_day_start(now) if task.order_id is not None else None)
+    return await find_current_executor(task, db, now)
@@ -1,8 +1,9 @@
-from datetime import datetime
-from typing import Iterable
+from datetime import datetime, time, timedelta
 
-from fastapi import APIRouter
-from sqlalchemy import select, delete
+from fastapi import APIRouter, Response
+from sqlalchemy import select, delete, and_, func, literal, union_all
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.functions import count
 
 from src.api.exceptions import (
@@ -11,14 +12,25 @@ from src.api.exceptions import (
 from src.api.utils import (
     USER_DEPENDENCY,
     ROOM_DEPENDENCY,
+    HEADER_ROOM_DEPENDENCY,
+    HEADER_ROOM_ETAG_DEPENDENCY,
+    EXPIRING_ROOM_ETAG_DEPENDENCY,
+    CACHE_CONTROL_DEPENDENCY,
+    coalesce_by_room,
+    invalidate_cached,
+    room_etag,
+    touch_room,
 )
-from src.db_sessions import DB_SESSION_DEPENDENCY
+from src.cache import users_cache, daily_info_cache, room_snapshots, RoomSnapshot
+from src.db_sessions import DB_SESSION_DEPENDENCY, read_only
+from src.db_sessions.replicas import reads_replica
 from src.models.sql import User, Room, Invitation, TaskExecutor, Order, Task
 from src.models.sql.manual_task import ManualTask
 from src.schemas.method_input_schemas import (
     CreateRoomBody,
 )
 from src.schemas.method_output_schemas import (
+    DailyInfo,
     DailyInfoResponse,
     TaskDailyInfo,
     RoomInfoResponse,
@@ -38,55 +50,173 @@ async def create_room(user: USER_DEPENDENCY, room: CreateRoomBody, db: DB_SESSIO
     db.add(room)
     await db.flush()
     user.room_id = room.id
+    invalidate_cached(db, users_cache, user.id)
     await db.commit()
 
     return room.id
 
 
 @router.post("/daily_info", response_description="Statuses of the tasks of the room")
+@read_only
 async def get_daily_info(room: ROOM_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> DailyInfoResponse:
+    return (await load_daily_info(room=room, db=db)).response
+
+
+@coalesce_by_room
+async def load_daily_info(room: Room, db: AsyncSession) -> DailyInfo:
+    # inside an atomic batch the cache may lag behind the uncommitted changes of the batch
+    use_cache = not db.info.get("in_outer_transaction")
+    if use_cache and (daily_info := await daily_info_cache.get(room.id)) is not None:
+        return daily_info
+
+    cache_version = await daily_info_cache.get_version()
+    now = datetime.now()
+    daily_info = await compute_daily_info(room, db, now)
+    if use_cache and not reads_replica(db):
+        await daily_info_cache.set(
+            room.id, daily_info, ttl=(daily_info.expires_at - now).total_seconds(), version=cache_version
+        )
+    return daily_info
+
+
+async def compute_daily_info(room: Room, db: AsyncSession, now: datetime) -> DailyInfo:
+    """The response of `get_daily_info` at `now` with the moment when it expires."""
+    snapshot = room_snapshots.read(room.id, room.version)
+    if snapshot is not None and (daily_info := get_daily_info_from_snapshot(snapshot, now)) is not None:
+        return daily_info
+    room_snapshots.schedule_refresh(room.id)
+
+    executors_count = select(count()).where(TaskExecutor.order_id == Task.order_id).correlate(Task).scalar_subquery()
+    periodic_tasks = (
+        select(
+            literal(True).label("is_periodic"), Task.id, Task.name, User.id.label("user_id"), User.alias, User.fullname
+        )
+        .select_from(Task)
+        .join(
+            TaskExecutor,
+            and_(
+                TaskExecutor.order_id == Task.order_id,
+                TaskExecutor.order_number == Task.today_executor_index_clause(now, executors_count),
+            ),
+        )
+        .join(User, User.id == TaskExecutor.user_id)
+        .where(Task.room_id == room.id, Task.is_active_clause(now), Task.is_today_duty_clause(now))
+    )
+    manual_tasks = (
+        select(
+            literal(False).label("is_periodic"),
+            ManualTask.id,
+            ManualTask.name,
+            User.id.label("user_id"),
+            User.alias,
+            User.fullname,
+        )
+        .select_from(ManualTask)
+        .join(
+            TaskExecutor,
+            and_(TaskExecutor.order_id == ManualTask.order_id, TaskExecutor.order_number == ManualTask.counter),
+        )
+        .join(User, User.id == TaskExecutor.user_id)
+        .where(ManualTask.room_id == room.id)
+    )
+    statement = union_all(periodic_tasks, manual_tasks)
+    rows = await db.execute(
+        statement.order_by(statement.selected_columns.is_periodic.desc(), statement.selected_columns.id)
+    )
+
     response = DailyInfoResponse(periodic_tasks=[], manual_tasks=[], user_info={})
-    users = set()
+    for row in rows:
+        tasks = response.periodic_tasks if row.is_periodic else response.manual_tasks
+        tasks.append(TaskDailyInfo(id=row.id, name=row.name, today_executor=row.user_id))
+        response.user_info[row.user_id] = UserInfo(id=row.user_id, alias=row.alias, fullname=row.fullname)
 
-    periodic_tasks: Iterable[Task] = await db.scalars(select(Task).where(Task.room_id == room.id))
-    for task in periodic_tasks:
-        if task.is_inactive() or not task.is_today_duty(datetime.now()):
-            continue
+    # the response only changes at midnight, when a day of a task with another start time passes
+    # or when the room is modified, which invalidates the cache
+    expires_at = datetime.combine(now.date() + timedelta(days=1), time.min)
+    for task in await db.scalars(select(Task).where(Task.room_id == room.id, Task.order_id.is_not(None))):
+        expires_at = min(expires_at, task.get_next_day_start(now))
+    return DailyInfo(response=response, expires_at=expires_at)
 
-        # executors = task.order.executors
-        executors_count: int = await db.scalar(select(count()).where(TaskExecutor.order_id == task.order_id))
-        i = task.get_today_executor_index(datetime.now(), executors_count)
 
-        executor: TaskExecutor = await db.get_one(TaskExecutor, (task.order_id, i))
-        users.add(executor.user_id)
-        response.periodic_tasks.append(TaskDailyInfo(id=task.id, name=task.name, today_executor=executor.user_id))
+def get_daily_info_from_snapshot(snapshot: RoomSnapshot, now: datetime) -> DailyInfo | None:
+    """
+    The same as `get_daily_info` computed in Python, with the moment when the response expires.
+    None if the snapshot lacks an order or a user it refers to, then the response is computed by the database.
+    """
+    users = {user.id: user for user in snapshot.users}
+    response = DailyInfoResponse(periodic_tasks=[], manual_tasks=[], user_info={})
+
+    def add_task(tasks: list[TaskDailyInfo], task_id: int, name: str, user_id: int) -> bool:
+        if (user := users.get(user_id)) is None:
+            return False
+        tasks.append(TaskDailyInfo(id=task_id, name=name, today_executor=user_id))
+        response.user_info[user_id] = UserInfo(id=user_id, alias=user.alias, fullname=user.fullname)
+        return True
 
-    manual_tasks: Iterable[ManualTask] = await db.scalars(select(ManualTask).where(ManualTask.room_id == room.id))
-    for task in manual_tasks:
-        if task.is_inactive():
+    expires_at = datetime.combine(now.date() + timedelta(days=1), time.min)
+    for t in snapshot.tasks:
+        task = Task(id_=t.id, name=t.name, start_date=t.start_date, period=t.period, order_id=t.order_id)
+        if task.order_id is None:
             continue
+        expires_at = min(expires_at, task.get_next_day_start(now))
+        if (executors := snapshot.orders.get(task.order_id)) is None:
+            return None
+        if task.start_date <= now and task.is_today_duty(now) and executors:
+            executor = executors[task.get_today_executor_index(now, len(executors))]
+            if not add_task(response.periodic_tasks, task.id, task.name, executor):
+                return None
+    for task in snapshot.manual_tasks:
+        if task.order_id is None:
+            continue
+        if (executors := snapshot.orders.get(task.order_id)) is None:
+            return None
+        if task.counter < len(executors) and not add_task(
+            response.manual_tasks, task.id, task.name, executors[task.counter]
+        ):
+            return None
+    return DailyInfo(response=response, expires_at=expires_at)
 
-        # executors = task.order.executors
-        executor: TaskExecutor = await db.get_one(TaskExecutor, (task.order_id, task.counter))
-        users.add(executor.user_id)
-        response.manual_tasks.append(TaskDailyInfo(id=task.id, name=task.name, today_executor=executor.user_id))
 
-    response.user_info = {
-        u.id: UserInfo.model_validate(u, from_attributes=True)
-        for u in await db.scalars(select(User).where(User.id.in_(users)))
-    }
-    return response
+@router.get(
+    "/daily_info",
+    response_description="Statuses of the tasks of the room",
+    dependencies=[CACHE_CONTROL_DEPENDENCY, EXPIRING_ROOM_ETAG_DEPENDENCY],
+)
+@read_only
+async def read_daily_info(
+    room: HEADER_ROOM_DEPENDENCY, response: Response, db: DB_SESSION_DEPENDENCY
+) -> DailyInfoResponse:
+    daily_info = await load_daily_info(room=room, db=db)
+    response.headers["ETag"] = room_etag(room, daily_info.expires_at)
+    return daily_info.response
 
 
 @router.post("/info", response_description="Info about the user's room")
+@read_only
+@coalesce_by_room
 async def get_room_info(room: ROOM_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> RoomInfoResponse:
-    user_ids = [id_ for id_ in await db.scalars(select(User.id).where(User.room_id == room.id))]
-    users = [await db.get_one(User, id_) for id_ in user_ids]
+    if (snapshot := room_snapshots.read(room.id, room.version)) is not None:
+        return RoomInfoResponse(
+            id=room.id,
+            name=room.name,
+            users=[UserInfo(id=u.id, alias=u.alias, fullname=u.fullname) for u in snapshot.users if u.is_member],
+        )
+    users = await db.execute(select(User.id, User.alias, User.fullname).where(User.room_id == room.id))
     return RoomInfoResponse(
         id=room.id, name=room.name, users=[UserInfo.model_validate(user, from_attributes=True) for user in users]
     )
 
 
+@router.get(
+    "/info",
+    response_description="Info about the user's room",
+    dependencies=[CACHE_CONTROL_DEPENDENCY, HEADER_ROOM_ETAG_DEPENDENCY],
+)
+@read_only
+async def read_room_info(room: HEADER_ROOM_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> RoomInfoResponse:
+    return await get_room_info(room=room, db=db)
+
+
 @router.post("/leave", response_description="True if the operation was successful")
 async def leave_room(user: USER_DEPENDENCY, room: ROOM_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> bool:
     roommates_count = (await db.execute(select(count()).where(User.room_id == room.id))).scalar()
@@ -96,30 +226,51 @@ async def leave_room(user: USER_DEPENDENCY, room: ROOM_DEPENDENCY, db: DB_SESSIO
         # await db.delete(room)
         # does not work for some reason causing UPDATE invitations SET NULL instead of just cascade deletion
         await db.execute(delete(Room).where(Room.id == room.id))
+    await touch_room(room.id, db)
+    invalidate_cached(db, users_cache, user.id)
     await db.commit()
     return True
 
 
-@router.post("/list_of_orders", response_description="The list of existing orders with info about users")
+@router.post(
+    "/list_of_orders",
+    response_description="The list of existing orders with info about users",
+)
+@read_only
 async def get_list_of_orders(room: ROOM_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> ListOfOrdersResponse:
-    orders: Iterable[Order] = await db.scalars(select(Order).where(Order.room_id == room.id))
-    response = ListOfOrdersResponse(users=[], orders={})
-    user_ids = set()
-    for order in orders:
-        users: list[int] = list(
-            await db.scalars(
-                select(User.id)
-                .select_from(TaskExecutor)
-                .join(User)
-                .order_by(TaskExecutor.order_number)
-                .where(TaskExecutor.order_id == order.id)
-            )
+    rows = await db.execute(
+        select(
+            Order.id,
+            func.array_agg(aggregate_order_by(User.id, TaskExecutor.order_number)).label("user_ids"),
+            func.array_agg(aggregate_order_by(User.alias, TaskExecutor.order_number)).label("aliases"),
+            func.array_agg(aggregate_order_by(User.fullname, TaskExecutor.order_number)).label("fullnames"),
         )
-        response.orders[order.id] = users
-        user_ids.update(users)
+        .select_from(Order)
+        .outerjoin(TaskExecutor, TaskExecutor.order_id == Order.id)
+        .outerjoin(User, User.id == TaskExecutor.user_id)
+        .where(Order.room_id == room.id)
+        .group_by(Order.id)
+        .order_by(Order.id)
+    )
 
-    users: Iterable[User] = await db.scalars(select(User).where(User.id.in_(user_ids)))
-    for user in users:
-        response.users.append(UserInfo.model_validate(user, from_attributes=True))
+    response = ListOfOrdersResponse(users=[], orders={})
+    users: dict[int, UserInfo] = {}
+    for order_id, user_ids, aliases, fullnames in rows:
+        # an order without executors is aggregated from a single row of NULLs
+        response.orders[order_id] = [id_ for id_ in user_ids if id_ is not None]
+        for id_, alias, fullname in zip(user_ids, aliases, fullnames):
+            if id_ is not None and id_ not in users:
+                users[id_] = UserInfo(id=id_, alias=alias, fullname=fullname)
+    response.users = list(users.values())
 
     return response
+
+
+@router.get(
+    "/list_of_orders",
+    response_description="The list of existing orders with info about users",
+    dependencies=[CACHE_CONTROL_DEPENDENCY, HEADER_ROOM_ETAG_DEPENDENCY],
+)
+@read_only
+async def read_list_of_orders(room: HEADER_ROOM_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> ListOfOrdersResponse:
+    return await get_list_of_orders(room=room, db=db)
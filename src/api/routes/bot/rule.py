@@ -5,9 +5,14 @@ from sqlalchemy import select
 
 from src.api.utils import (
     ROOM_DEPENDENCY,
+    HEADER_ROOM_DEPENDENCY,
+    HEADER_ROOM_ETAG_DEPENDENCY,
+    CACHE_CONTROL_DEPENDENCY,
     check_rule_exists,
+    coalesce_by_room,
+    touch_room,
 )
-from src.db_sessions import DB_SESSION_DEPENDENCY
+from src.db_sessions import DB_SESSION_DEPENDENCY, read_only
 from src.models.sql import Rule
 from src.schemas.method_input_schemas import (
     CreateRuleBody,
@@ -22,16 +27,27 @@ router = APIRouter(prefix="/rule")
 async def create_rule(room: ROOM_DEPENDENCY, rule: CreateRuleBody, db: DB_SESSION_DEPENDENCY) -> int:
     rule_obj = Rule(name=rule.name, text=rule.text, room_id=room.id)
     db.add(rule_obj)
+    await touch_room(room.id, db)
     await db.commit()
     return rule_obj.id
 
 
 @router.post("/list", response_description="List of rules")
+@read_only
+@coalesce_by_room
 async def list_rules(room: ROOM_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> list[RuleInfo]:
     rules: list[Rule] = (await db.scalars(select(Rule).where(Rule.room_id == room.id))).all()
     return [RuleInfo.model_validate(rule, from_attributes=True) for rule in rules]
 
 
+@router.get(
+    "/list", response_description="List of rules", dependencies=[CACHE_CONTROL_DEPENDENCY, HEADER_ROOM_ETAG_DEPENDENCY]
+)
+@read_only
+async def read_rules(room: HEADER_ROOM_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> list[RuleInfo]:
+    return await list_rules(room=room, db=db)
+
+
 @router.post("/edit")
 async def edit_rule(room: ROOM_DEPENDENCY, rule: EditRuleBody, db: DB_SESSION_DEPENDENCY) -> None:
     rule_obj = await check_rule_exists(rule.id, room.id, db)
@@ -39,6 +55,7 @@ async def edit_rule(room: ROOM_DEPENDENCY, rule: EditRuleBody, db: DB_SESSION_DE
         rule_obj.name = rule.name
     if rule.text:
         rule_obj.text = rule.text
+    await touch_room(room.id, db)
     await db.commit()
 
 
@@ -46,4 +63,5 @@ async def edit_rule(room: ROOM_DEPENDENCY, rule: EditRuleBody, db: DB_SESSION_DE
 async def delete_rule(room: ROOM_DEPENDENCY, rule_id: Annotated[int, Body()], db: DB_SESSION_DEPENDENCY) -> None:
     rule = await check_rule_exists(rule_id, room.id, db)
     await db.delete(rule)
+    await touch_room(room.id, db)
     await db.commit()
@@ -1,14 +1,18 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Body
-from sqlalchemy import delete, update, func
+from sqlalchemy import delete, update, func, select, distinct
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.api.utils import (
     check_user_not_exists,
+    invalidate_cached,
+    touch_room,
     USER_DEPENDENCY,
 )
+from src.cache import users_cache, unknown_users_cache
 from src.db_sessions import DB_SESSION_DEPENDENCY
-from src.models.sql import User, Invitation
+from src.models.sql import User, Invitation, Order, TaskExecutor
 from src.schemas.method_input_schemas import (
     CreateUserBody,
 )
@@ -16,12 +20,31 @@ from src.schemas.method_input_schemas import (
 router = APIRouter(prefix="/user")
 
 
+async def get_shown_in_rooms(user: User, db: AsyncSession) -> set[int]:
+    """
+    The rooms whose data shows the user's alias and fullname: the user's room
+    and the rooms of the orders the user executes, which the user may have left.
+    """
+    room_ids = set(
+        await db.scalars(
+            select(distinct(Order.room_id))
+            .join(TaskExecutor, TaskExecutor.order_id == Order.id)
+            .where(TaskExecutor.user_id == user.id)
+        )
+    )
+    if user.room_id is not None:
+        room_ids.add(user.room_id)
+    return room_ids
+
+
 @router.post("/create", response_description="The user's id")
 async def create_user(user: CreateUserBody, db: DB_SESSION_DEPENDENCY) -> int:
     await check_user_not_exists(user.user_id, db)
 
     new_user = User(user.user_id)
     db.add(new_user)
+    invalidate_cached(db, users_cache, new_user.id)
+    invalidate_cached(db, unknown_users_cache, new_user.id)
     await db.commit()
 
     return new_user.id
@@ -31,16 +54,22 @@ async def create_user(user: CreateUserBody, db: DB_SESSION_DEPENDENCY) -> int:
 async def save_user_alias(
     user: USER_DEPENDENCY, db: DB_SESSION_DEPENDENCY, alias: Annotated[str | None, Body()] = None
 ) -> bool:
+    modified_rooms = await get_shown_in_rooms(user, db)
     if user.alias is not None:
         if alias is None:
-            await db.execute(delete(Invitation).where(func.lower(Invitation.addressee_alias) == user.alias.lower()))
+            statement = delete(Invitation).where(func.lower(Invitation.addressee_alias) == user.alias.lower())
         else:
-            await db.execute(
+            statement = (
                 update(Invitation)
                 .where(func.lower(Invitation.addressee_alias) == user.alias.lower())
                 .values(addressee_alias=alias)
             )
+        # the rooms of the invitations addressed to the user
+        modified_rooms.update((await db.scalars(statement.returning(Invitation.room_id))).all())
     user.alias = alias
+    for room_id in modified_rooms:
+        await touch_room(room_id, db)
+    invalidate_cached(db, users_cache, user.id)
     await db.commit()
     return True
 
@@ -50,5 +79,8 @@ async def save_user_fullname(
     user: USER_DEPENDENCY, fullname: Annotated[str, Body()], db: DB_SESSION_DEPENDENCY
 ) -> bool:
     user.fullname = fullname
+    for room_id in await get_shown_in_rooms(user, db):
+        await touch_room(room_id, db)
+    invalidate_cached(db, users_cache, user.id)
     await db.commit()
     return True
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+
+from src.api.auth.utils import BOT_ACCESS_DEPENDENCY
+from src.api.utils import room_reads
+from src.cache import get_cache_stats
+from src.db_sessions.sqlalchemy_session import session_maker
+
+router = APIRouter(prefix="/metrics", dependencies=[BOT_ACCESS_DEPENDENCY])
+
+
+@router.get("", response_description="Counters of the service's caches, coalesced requests and connection pool")
+async def get_metrics() -> dict[str, dict]:
+    return {
+        "caches": await get_cache_stats(),
+        "singleflight": {"room_reads": room_reads.stats()},
+        "db_pool": session_maker.pool_stats(),
+    }
@@ -1,9 +1,17 @@
-from typing import Annotated
+import functools
+import hashlib
+import re
+from datetime import datetime
+from typing import Annotated, Awaitable, Callable, TypeVar
 
-from fastapi import Body, Depends
+from fastapi import Body, Depends, Header, Response
+from pydantic import BaseModel
+from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
 from src.api.exceptions import (
+    NotModifiedException,
     TaskNotExistException,
     OrderNotExistException,
     UserWithoutRoomException,
@@ -16,7 +24,17 @@ from src.api.exceptions import (
     UserOwningException,
     RuleNotExistException,
 )
+from src.cache import (
+    SingleFlight,
+    users_cache,
+    rooms_cache,
+    unknown_users_cache,
+    daily_info_cache,
+    room_snapshots,
+    invalidate_cached,
+)
 from src.db_sessions import DB_SESSION_DEPENDENCY
+from src.db_sessions.replicas import check_primary_pin, reads_replica
 from src.models.sql import User, Room, Order, Task, Invitation, Rule, ManualTask
 
 
@@ -25,20 +43,105 @@ async def check_user_not_exists(user_id: int, db: AsyncSession):
         raise UserExistsException()
 
 
-async def check_user_exists(user_id: int, db: AsyncSession) -> User:
-    if (user := await db.get(User, user_id)) is None:
+async def touch_room(room_id: int, db: AsyncSession):
+    """
+    Mark a change of the room's tasks, orders, rules, members or invitations
+    in the current transaction: increment the room's version and drop its cached data on commit.
+    """
+    await db.execute(
+        update(Room).where(Room.id == room_id).values(version=Room.version + 1, modified_at=datetime.now())
+    )
+    # the cached room row holds the version
+    invalidate_cached(db, rooms_cache, room_id)
+    invalidate_cached(db, daily_info_cache, room_id)
+    invalidate_cached(db, room_snapshots, room_id)
+
+
+CachedEntity = TypeVar("CachedEntity", User, Room)
+
+
+async def restore_cached(model: type[CachedEntity], data: dict, db: AsyncSession) -> CachedEntity:
+    """Attach an entity restored from cached column values to the session without querying the database."""
+    obj = model.model_validate(data)
+    make_transient_to_detached(obj)
+    return await db.merge(obj, load=False)
+
+
+async def fetch_user_room(user_id: int, db: AsyncSession) -> tuple[User, Room | None]:
+    user_room = (
+        (await db.execute(select(User, Room).outerjoin(Room, Room.id == User.room_id).where(User.id == user_id)))
+        .tuples()
+        .one_or_none()
+    )
+    if user_room is None:
         raise UserNotExistException()
-    # noinspection PyTypeChecker
-    return user
+    return user_room
+
+
+async def get_user_room(user_id: int, db: AsyncSession) -> tuple[User, Room | None]:
+    # inside an atomic batch the caches may lag behind the uncommitted changes of the batch
+    if db.info.get("in_outer_transaction"):
+        return await fetch_user_room(user_id, db)
+
+    await check_primary_pin(db, user_id)
+    if await unknown_users_cache.get(user_id):
+        raise UserNotExistException()
+    if (user_data := await users_cache.get(user_id)) is not None:
+        if user_data["room_id"] is None:
+            return await restore_cached(User, user_data, db), None
+        if (room_data := await rooms_cache.get(user_data["room_id"])) is not None:
+            return await restore_cached(User, user_data, db), await restore_cached(Room, room_data, db)
+
+    if reads_replica(db):
+        return await fetch_user_room(user_id, db)
+
+    users_version, rooms_version = await users_cache.get_version(), await rooms_cache.get_version()
+    unknown_users_version = await unknown_users_cache.get_version()
+    try:
+        user, room = await fetch_user_room(user_id, db)
+    except UserNotExistException:
+        # the version guard keeps out the id if the user is registered meanwhile
+        await unknown_users_cache.set(user_id, True, version=unknown_users_version)
+        raise
+    await users_cache.set(user.id, user.model_dump(), version=users_version)
+    if room is not None:
+        await rooms_cache.set(room.id, room.model_dump(), version=rooms_version)
+    return user, room
+
+
+async def user_room_dependency(
+    user_id: Annotated[int, Body(embed=True)], db: DB_SESSION_DEPENDENCY
+) -> tuple[User, Room | None]:
+    return await get_user_room(user_id, db)
+
+
+USER_ROOM_DEPENDENCY = Annotated[tuple[User, Room | None], Depends(user_room_dependency)]
 
 
-async def user_dependency(user_id: Annotated[int, Body(embed=True)], db: DB_SESSION_DEPENDENCY) -> User:
-    return await check_user_exists(user_id, db)
+async def header_user_room_dependency(
+    user_id: Annotated[int, Header(alias="X-User-Id")], db: DB_SESSION_DEPENDENCY
+) -> tuple[User, Room | None]:
+    """Analogue of `user_room_dependency` for GET routes, which take the user's id from a header."""
+    return await get_user_room(user_id, db)
+
+
+HEADER_USER_ROOM_DEPENDENCY = Annotated[tuple[User, Room | None], Depends(header_user_room_dependency)]
+
+
+async def user_dependency(user_room: USER_ROOM_DEPENDENCY) -> User:
+    return user_room[0]
 
 
 USER_DEPENDENCY = Annotated[User, Depends(user_dependency)]
 
 
+async def header_user_dependency(user_room: HEADER_USER_ROOM_DEPENDENCY) -> User:
+    return user_room[0]
+
+
+HEADER_USER_DEPENDENCY = Annotated[User, Depends(header_user_dependency)]
+
+
 async def check_room_not_exists(room_id: int, db: AsyncSession):
     if (await db.get(Room, room_id)) is not None:
         raise RoomExistsException()
@@ -51,28 +154,167 @@ async def check_room_exists(room_id: int, db: AsyncSession) -> Room:
     return room
 
 
-async def room_dependency(user: USER_DEPENDENCY, db: DB_SESSION_DEPENDENCY) -> Room:
+def get_users_room(user_room: tuple[User, Room | None]) -> Room:
+    user, room = user_room
     if user.room_id is None:
         raise UserWithoutRoomException()
-    return await db.get_one(Room, user.room_id)
+    # noinspection PyTypeChecker
+    return room
+
+
+async def room_dependency(user_room: USER_ROOM_DEPENDENCY) -> Room:
+    return get_users_room(user_room)
 
 
 ROOM_DEPENDENCY = Annotated[Room, Depends(room_dependency)]
 
 
+async def header_room_dependency(user_room: HEADER_USER_ROOM_DEPENDENCY) -> Room:
+    return get_users_room(user_room)
+
+
+HEADER_ROOM_DEPENDENCY = Annotated[Room, Depends(header_room_dependency)]
+
+
+def room_etag(room: Room, expires_at: datetime | None = None) -> str:
+    """
+    The tag of a GET route's response computed from the room's data at its version.
+    If the response also changes with time, it is valid until `expires_at`, which is a part of the tag.
+    """
+    if expires_at is None:
+        return f'"{room.id}-{room.version}"'
+    # rounded down, so the tag never outlives the response
+    return f'"{room.id}-{room.version}-{int(expires_at.timestamp())}"'
+
+
+_ROOM_ETAG = re.compile(r'"(-?\d+)-(\d+)(?:-(\d+))?"')
+
+
+def is_room_etag_current(room: Room, etag: str) -> bool:
+    if (match := _ROOM_ETAG.fullmatch(etag)) is None:
+        return False
+    room_id, version, expires_at = match.groups()
+    return (
+        int(room_id) == room.id
+        and int(version) == room.version
+        and (expires_at is None or datetime.now().timestamp() < int(expires_at))
+    )
+
+
+def check_room_etag(room: Room, response: Response, if_none_match: str | None):
+    """
+    If the client already has a response to the GET route that is current for the room's version,
+    answer the request with 304 before the route loads anything.
+    The route's response must depend only on the room's data, its URL and the time, not on the user.
+    POST routes are not tagged: they take the ids of objects in the body, so their responses about
+    different objects would share a tag, and a POST must not be answered with 304.
+    """
+    if if_none_match is None:
+        return
+    for etag in map(str.strip, if_none_match.split(",")):
+        if etag == "*" or is_room_etag_current(room, etag):
+            # keep the headers set by the preceding dependencies, e.g. caching ones
+            raise NotModifiedException(room_etag(room) if etag == "*" else etag, dict(response.headers))
+
+
+async def header_room_etag_dependency(
+    room: HEADER_ROOM_DEPENDENCY, response: Response, if_none_match: Annotated[str | None, Header()] = None
+):
+    check_room_etag(room, response, if_none_match)
+    response.headers["ETag"] = room_etag(room)
+
+
+HEADER_ROOM_ETAG_DEPENDENCY = Depends(header_room_etag_dependency)
+
+
+async def expiring_room_etag_dependency(
+    room: HEADER_ROOM_DEPENDENCY, response: Response, if_none_match: Annotated[str | None, Header()] = None
+):
+    """For GET routes whose responses also change with time, they set the tag with `room_etag(room, expires_at)`."""
+    check_room_etag(room, response, if_none_match)
+
+
+EXPIRING_ROOM_ETAG_DEPENDENCY = Depends(expiring_room_etag_dependency)
+
+
+def check_content_etag(content: BaseModel, response: Response, if_none_match: str | None):
+    """
+    Tag the response of a GET route that does not depend on a single room with a hash of its content.
+    The route loads the data anyway, but a client that already has it is answered with 304 without the body.
+    """
+    etag = f'"{hashlib.sha256(content.model_dump_json().encode()).hexdigest()[:32]}"'
+    if if_none_match is not None and etag in map(str.strip, if_none_match.split(",")):
+        raise NotModifiedException(etag, dict(response.headers))
+    response.headers["ETag"] = etag
+
+
+async def cache_control_dependency(response: Response):
+    # responses of GET routes may be stored by any cache, but must be revalidated before each use:
+    # the data changes with the bot's requests, and revalidation also checks the token.
+    # every GET route sends an ETag, and the routes tagged with the room's version
+    # answer revalidations without loading the data
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "X-User-Id, X-Token"
+
+
+CACHE_CONTROL_DEPENDENCY = Depends(cache_control_dependency)
+
+
+room_reads = SingleFlight()
+
+ReadResult = TypeVar("ReadResult")
+
+
+def coalesce_by_room(endpoint: Callable[..., Awaitable[ReadResult]]) -> Callable[..., Awaitable[ReadResult]]:
+    """
+    Make concurrent calls of a read-only route for the same version of a room share one computation.
+    The route, or the function loading its data, must be called with `room` and `db` keyword arguments.
+    """
+    key = f"{endpoint.__module__}.{endpoint.__qualname__}"
+
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs) -> ReadResult:
+        room, db = kwargs["room"], kwargs["db"]
+        # inside an atomic batch the route may have to see uncommitted changes of the batch
+        if db.info.get("in_outer_transaction"):
+            return await endpoint(**kwargs)
+        # a call that has seen a newer version, e.g. after a commit, must not get the result of an earlier one,
+        # which the ETag of the newer version would tag; neither must a call routed to the primary
+        # to see its user's changes get the result read from a replica
+        return await room_reads.do((key, room.id, room.version, reads_replica(db)), lambda: endpoint(**kwargs))
+
+    return wrapper
+
+
+RoomObject = TypeVar("RoomObject", Order, Task, Rule, ManualTask)
+
+
+async def get_room_object(
+    model: type[RoomObject], object_id: int, room_id: int, db: AsyncSession
+) -> tuple[RoomObject | None, bool]:
+    row = (
+        (await db.execute(select(model, (model.room_id == room_id).label("is_owned")).where(model.id == object_id)))
+        .tuples()
+        .one_or_none()
+    )
+    return row or (None, False)
+
+
 async def check_order_exists(order_id: int, room_id: int, db: AsyncSession) -> Order:
-    if (order := await db.get(Order, order_id)) is None:
+    order, is_owned = await get_room_object(Order, order_id, room_id, db)
+    if order is None:
         raise OrderNotExistException()
-    if order.room_id != room_id:
+    if not is_owned:
         raise RoomOwningException("order")
     # noinspection PyTypeChecker
     return order
 
 
 async def check_task_exists(task_id: int, room_id: int, db: AsyncSession) -> Task:
-    if (task := await db.get(Task, task_id)) is None:
+    task, is_owned = await get_room_object(Task, task_id, room_id, db)
+    if task is None:
         raise TaskNotExistException()
-    if task.room_id != room_id:
+    if not is_owned:
         raise RoomOwningException("task")
     # noinspection PyTypeChecker
     return task
@@ -87,19 +329,29 @@ async def check_invitation_exists(invitation_id: int, sender_id: int, db: AsyncS
     return invitation
 
 
+async def delete_expired_invitations(sender_id: int | None, db: AsyncSession):
+    """Delete the expired invitations of the sender, or of all senders if `sender_id` is None."""
+    condition = Invitation.expiration_date <= datetime.now()
+    if sender_id is not None:
+        condition &= Invitation.sender_id == sender_id
+    await db.execute(delete(Invitation).where(condition))
+
+
 async def check_rule_exists(rule_id: int, room_id: int, db: AsyncSession) -> Rule:
-    if (rule := await db.get(Rule, rule_id)) is None:
+    rule, is_owned = await get_room_object(Rule, rule_id, room_id, db)
+    if rule is None:
         raise RuleNotExistException()
-    if rule.room_id != room_id:
+    if not is_owned:
         raise RoomOwningException("rule")
     # noinspection PyTypeChecker
     return rule
 
 
 async def check_manual_task_exists(task_id: int, room_id: int, db: AsyncSession) -> ManualTask:
-    if (task := await db.get(ManualTask, task_id)) is None:
+    task, is_owned = await get_room_object(ManualTask, task_id, room_id, db)
+    if task is None:
         raise TaskNotExistException()
-    if task.room_id != room_id:
+    if not is_owned:
         raise RoomOwningException("manual task")
     # noinspection PyTypeChecker
     return task
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.api.routes.bot.room import compute_daily_info
+from src.cache import users_cache, rooms_cache, daily_info_cache, room_snapshots, load_room_snapshot
+from src.config import get_settings
+from src.db_sessions.sqlalchemy_session import session_maker
+from src.models.sql import User, Room
+
+# seconds between attempts to refresh the caches if they fail
+WARMUP_RETRY_DELAY = 5
+
+
+async def get_active_room_ids(db: AsyncSession, limit: int) -> list[int]:
+    return list(await db.scalars(select(Room.id).order_by(Room.modified_at.desc()).limit(limit)))
+
+
+async def preload_rooms(room_ids: list[int], db: AsyncSession) -> datetime:
+    """
+    Put the rows of the rooms and their members, the rooms' daily info and snapshots into the caches,
+    replacing the cached entries. Returns the moment when the earliest of the daily infos expires.
+    `db` must see one snapshot of the database, see `load_room_snapshot`.
+    """
+    users_version, rooms_version = await users_cache.get_version(), await rooms_cache.get_version()
+    daily_info_version = await daily_info_cache.get_version()
+
+    for user in await db.scalars(select(User).where(User.room_id.in_(room_ids))):
+        await users_cache.set(user.id, user.model_dump(), version=users_version)
+
+    now = datetime.now()
+    expires_at = now + timedelta(days=1)
+    for room in await db.scalars(select(Room).where(Room.id.in_(room_ids))):
+        await rooms_cache.set(room.id, room.model_dump(), version=rooms_version)
+        if room_snapshots.is_writer and (snapshot := await load_room_snapshot(room.id, db)) is not None:
+            room_snapshots.write(snapshot)
+        daily_info = await compute_daily_info(room, db, now)
+        await daily_info_cache.set(
+            room.id, daily_info, ttl=(daily_info.expires_at - now).total_seconds(), version=daily_info_version
+        )
+        expires_at = min(expires_at, daily_info.expires_at)
+    return expires_at
+
+
+async def warm_up() -> datetime:
+    """Preload the data of the most recently modified rooms."""
+    settings = get_settings()
+    async with session_maker.get_snapshot_session() as db:
+        return await preload_rooms(await get_active_room_ids(db, settings.WARMUP_ROOMS), db)
+
+
+async def keep_warm(daily_info_expires_at: datetime):
+    """
+    Refresh the data of the most recently modified rooms until cancelled: the users and rooms shortly
+    before their entries expire, the daily infos right when they expire (e.g. at midnight),
+    since a daily info computed earlier would be one of the previous day.
+    """
+    settings = get_settings()
+    while True:
+        delay = min(
+            settings.ENTITY_CACHE_TTL - settings.WARMUP_REFRESH_MARGIN,
+            (daily_info_expires_at - datetime.now()).total_seconds(),
+        )
+        await asyncio.sleep(max(delay, 1))
+        try:
+            async with session_maker.get_snapshot_session() as db:
+                room_ids = await get_active_room_ids(db, settings.WARMUP_ROOMS)
+                daily_info_expires_at = await preload_rooms(room_ids, db)
+        except Exception as e:
+            # the loop must survive any failure, e.g. of the database, the pool or Redis
+            print(f"Refresh of the caches failed: {e!r}")
+            daily_info_expires_at = datetime.now() + timedelta(seconds=WARMUP_RETRY_DELAY)
@@ -0,0 +1,103 @@
+from pydantic import BaseModel
+
+from src.cache.base import Cache, InvalidationTarget
+from src.cache.invalidation import invalidate_cached, apply_invalidations, listen_for_invalidations
+from src.cache.lru import LRUCache
+from src.cache.memory_cache import MemoryCache
+from src.cache.room_snapshots import RoomSnapshot, RoomSnapshotStore, load_room_snapshot
+from src.cache.singleflight import SingleFlight
+from src.config import get_settings
+from src.schemas.method_output_schemas import DailyInfo
+
+settings = get_settings()
+
+if settings.CACHE_BACKEND == "redis":
+    from redis.asyncio import Redis
+
+    from src.cache.redis_cache import RedisCache
+
+    redis_client = Redis.from_url(settings.REDIS_URL)
+
+
+def create_cache(name: str, max_size: int, ttl: float, model: type[BaseModel] | None = None) -> Cache:
+    """`model` is the type of the values, if they are models, to restore them from a shared backend."""
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCache(redis_client, f"rooms-api:{name}", ttl, model)
+    return MemoryCache(max_size, ttl, name)
+
+
+# column values of User and Room rows used by the user and room dependencies
+users_cache: Cache[int, dict] = create_cache("users", settings.ENTITY_CACHE_SIZE, settings.ENTITY_CACHE_TTL)
+rooms_cache: Cache[int, dict] = create_cache("rooms", settings.ENTITY_CACHE_SIZE, settings.ENTITY_CACHE_TTL)
+
+# ids of users that are not registered, requests on behalf of them are rejected without querying the database
+unknown_users_cache: Cache[int, bool] = create_cache(
+    "unknown_users", settings.UNKNOWN_USER_CACHE_SIZE, settings.UNKNOWN_USER_CACHE_TTL
+)
+
+# responses of /bot/room/daily_info by room id, they expire when the day changes
+daily_info_cache: Cache[int, DailyInfo] = create_cache(
+    "daily_info", settings.DAILY_INFO_CACHE_SIZE, 24 * 60 * 60, DailyInfo
+)
+
+# ids of users who have recently changed something, their reads are not sent to replicas
+primary_pins: Cache[int, bool] = create_cache("primary_pins", settings.ENTITY_CACHE_SIZE, settings.DB_REPLICA_PIN_TIME)
+
+# members, orders and tasks of rooms shared by the workers of the host, the file is mapped on startup
+# if ROOM_SNAPSHOTS_PATH is set, and snapshots are only read while it is open
+room_snapshots = RoomSnapshotStore(settings.ROOM_SNAPSHOTS_SLOTS, settings.ROOM_SNAPSHOT_SIZE)
+
+# claims of access tokens with a verified signature,
+# they do not depend on any data, so each worker keeps its own cache
+tokens_cache: LRUCache[str, dict] = LRUCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
+data_caches: dict[str, Cache] = {
+    "users": users_cache,
+    "rooms": rooms_cache,
+    "unknown_users": unknown_users_cache,
+    "daily_info": daily_info_cache,
+}
+
+# the data of each worker that the listener keeps up with the changes committed by other workers
+invalidation_targets: list[InvalidationTarget] = [*data_caches.values(), room_snapshots]
+
+
+async def clear_caches():
+    for target in invalidation_targets:
+        await target.clear()
+    await primary_pins.clear()
+    tokens_cache.clear()
+
+
+async def get_cache_stats() -> dict[str, dict[str, int]]:
+    stats = {name: await cache.stats() for name, cache in data_caches.items()}
+    stats["room_snapshots"] = room_snapshots.stats()
+    stats["tokens"] = tokens_cache.stats()
+    return stats
+
+
+__all__ = [
+    "Cache",
+    "InvalidationTarget",
+    "LRUCache",
+    "MemoryCache",
+    "RoomSnapshot",
+    "RoomSnapshotStore",
+    "load_room_snapshot",
+    "SingleFlight",
+    "create_cache",
+    "invalidate_cached",
+    "apply_invalidations",
+    "listen_for_invalidations",
+    "users_cache",
+    "rooms_cache",
+    "unknown_users_cache",
+    "daily_info_cache",
+    "room_snapshots",
+    "primary_pins",
+    "tokens_cache",
+    "data_caches",
+    "invalidation_targets",
+    "clear_caches",
+    "get_cache_stats",
+]
@@ -0,0 +1,48 @@
+from abc import ABC, abstractmethod
+from typing import Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class InvalidationTarget(ABC, Generic[K]):
+    """Data derived from the database that is dropped by key when the changes of a transaction are committed."""
+
+    name: str
+    # whether all workers see the same entries, otherwise invalidations are broadcast to them
+    shared: bool = False
+
+    @abstractmethod
+    async def invalidate(self, key: K): ...
+
+    @abstractmethod
+    async def clear(self): ...
+
+
+class Cache(InvalidationTarget[K], Generic[K, V]):
+    """
+    Cache of the routes' data. Entries expire after `ttl` seconds.
+
+    Every invalidation changes the version of the cache, and `set` with the version read
+    before computing the value does not store it if something was invalidated meanwhile.
+    """
+
+    ttl: float
+    hits: int
+    misses: int
+
+    @abstractmethod
+    async def get(self, key: K) -> V | None: ...
+
+    @abstractmethod
+    async def set(self, key: K, value: V, ttl: float | None = None, version: int | None = None): ...
+
+    @abstractmethod
+    async def get_version(self) -> int: ...
+
+    @abstractmethod
+    async def size(self) -> int: ...
+
+    async def stats(self) -> dict[str, int]:
+        # hits and misses are counted by each worker
+        return {"size": await self.size(), "hits": self.hits, "misses": self.misses}
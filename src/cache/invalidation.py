@@ -0,0 +1,106 @@
+import asyncio
+from collections import defaultdict
+from typing import Hashable, Iterable
+
+import psycopg
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.cache.base import InvalidationTarget
+
+# channel of Postgres notifications about invalidated entries of the caches kept by each worker
+INVALIDATION_CHANNEL = "cache_invalidation"
+# seconds between attempts to reconnect the listener of the channel
+LISTEN_RETRY_DELAY = 1
+# Postgres rejects payloads of 8000 bytes or longer
+MAX_PAYLOAD_SIZE = 7999
+
+
+def invalidate_cached(db: AsyncSession | Session, cache: InvalidationTarget, key: Hashable):
+    """
+    Drop the cached entry after the changes of the session are committed.
+    Must be called before the commit, so that other workers are notified in the same transaction.
+    The invalidations are applied by the owner of the session with `apply_invalidations`.
+    """
+    db.info.setdefault("pending_invalidations", []).append((cache, key))
+    if not cache.shared:
+        db.info.setdefault("unsent_invalidations", []).append((cache, key))
+
+
+async def apply_invalidations(db: AsyncSession):
+    for cache, key in db.info.pop("pending_invalidations", []):
+        await cache.invalidate(key)
+
+
+def pack_invalidations(invalidations: Iterable[tuple[InvalidationTarget, Hashable]]) -> list[str]:
+    """
+    Pack the invalidations into as few payloads as possible, each of the form `name,name:key,key;name:key`.
+    The caches invalidated for the same keys, e.g. all caches of a touched room, share a single list of the keys.
+    """
+    keys_by_cache: defaultdict[str, set[str]] = defaultdict(set)
+    for cache, key in invalidations:
+        keys_by_cache[cache.name].add(str(key))
+    caches_by_keys: defaultdict[frozenset[str], list[str]] = defaultdict(list)
+    for name, keys in keys_by_cache.items():
+        caches_by_keys[frozenset(keys)].append(name)
+
+    segments = []
+    for keys, names in caches_by_keys.items():
+        prefix = ",".join(sorted(names)) + ":"
+        keys = sorted(keys)
+        step = max(1, (MAX_PAYLOAD_SIZE - len(prefix)) // (max(map(len, keys)) + 1))
+        segments += [prefix + ",".join(keys[i : i + step]) for i in range(0, len(keys), step)]
+    payloads = []
+    for segment in segments:
+        if payloads and len(payloads[-1]) + 1 + len(segment) <= MAX_PAYLOAD_SIZE:
+            payloads[-1] += ";" + segment
+        else:
+            payloads.append(segment)
+    return payloads
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_workers(session: Session):
+    # notifications are delivered only if the transaction is committed
+    for payload in pack_invalidations(session.info.pop("unsent_invalidations", [])):
+        session.execute(select(func.pg_notify(INVALIDATION_CHANNEL, payload)))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_unsent(session: Session, previous_transaction):
+    session.info.pop("unsent_invalidations", None)
+
+
+async def listen_for_invalidations(
+    url: str, caches: Iterable[InvalidationTarget], connected: asyncio.Event | None = None
+):
+    """
+    Apply the invalidations notified by other workers to `caches` until cancelled.
+    `url` is a libpq connection string of the database; the keys of the caches must be integers.
+    `connected` is set once the caches are cleared after the first connection, so they can be filled since then.
+    """
+    connected = connected or asyncio.Event()
+    caches = {cache.name: cache for cache in caches if not cache.shared}
+    if not caches:
+        connected.set()
+        return
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(url, autocommit=True) as connection:
+                await connection.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+                # notifications sent while the connection was down are lost
+                for cache in caches.values():
+                    await cache.clear()
+                connected.set()
+                async for notification in connection.notifies():
+                    for segment in notification.payload.split(";"):
+                        names, keys = segment.split(":")
+                        for name in names.split(","):
+                            if (cache := caches.get(name)) is not None:
+                                for key in keys.split(","):
+                                    await cache.invalidate(int(key))
+        except Exception as e:
+            # the notifications missed until the reconnection are made up for by clearing the caches again
+            print(f"Cache invalidation listener failed, reconnecting: {e!r}")
+            await asyncio.sleep(LISTEN_RETRY_DELAY)
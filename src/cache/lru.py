@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """In-process cache with a bounded number of entries, each of which expires after `ttl` seconds."""
+
+    _data: OrderedDict[K, tuple[float, V]]
+    _version: int
+    max_size: int
+    ttl: float
+    hits: int
+    misses: int
+
+    def __init__(self, max_size: int, ttl: float):
+        self._data = OrderedDict()
+        self._version = 0
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self) -> int:
+        """Changes on every invalidation, see `set`."""
+        return self._version
+
+    def get(self, key: K) -> V | None:
+        if (entry := self._data.get(key)) is None or entry[0] <= time.monotonic():
+            self._data.pop(key, None)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: K, value: V, ttl: float | None = None, version: int | None = None):
+        """
+        Store the value for `ttl` seconds, or the default TTL of the cache.
+
+        If `version` is given and something was invalidated since it was read, the value is not stored,
+        since it may have been computed from data changed by a concurrent request.
+        """
+        if self.max_size <= 0 or version is not None and version != self._version:
+            return
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: K):
+        self._version += 1
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._version += 1
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,42 @@
+from src.cache.base import Cache, K, V
+from src.cache.lru import LRUCache
+
+
+class MemoryCache(Cache[K, V]):
+    """Cache in the memory of the worker, bounded by `max_size` entries."""
+
+    _lru: LRUCache[K, V]
+
+    def __init__(self, max_size: int, ttl: float, name: str = ""):
+        self._lru = LRUCache(max_size, ttl)
+        self.name = name
+
+    @property
+    def ttl(self) -> float:
+        return self._lru.ttl
+
+    @property
+    def hits(self) -> int:
+        return self._lru.hits
+
+    @property
+    def misses(self) -> int:
+        return self._lru.misses
+
+    async def get(self, key: K) -> V | None:
+        return self._lru.get(key)
+
+    async def set(self, key: K, value: V, ttl: float | None = None, version: int | None = None):
+        self._lru.set(key, value, ttl, version)
+
+    async def invalidate(self, key: K):
+        self._lru.invalidate(key)
+
+    async def clear(self):
+        self._lru.clear()
+
+    async def get_version(self) -> int:
+        return self._lru.version
+
+    async def size(self) -> int:
+        return self._lru.stats()["size"]
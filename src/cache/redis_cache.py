@@ -0,0 +1,84 @@
+import json
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+
+from src.cache.base import Cache, K, V
+
+
+class RedisCache(Cache[K, V]):
+    """
+    Cache shared by all workers and replicas through a Redis server.
+    Its keys are prefixed with `namespace`; the memory is bounded by the server's `maxmemory` policy.
+    Values are stored as JSON, and read back as instances of `model` if it is given.
+    """
+
+    _client: Redis
+    _namespace: str
+    _version_key: str
+    _model: type[BaseModel] | None
+    shared = True
+
+    def __init__(self, client: Redis, namespace: str, ttl: float, model: type[BaseModel] | None = None):
+        self._client = client
+        self._namespace = namespace
+        self._model = model
+        self.name = namespace
+        self._version_key = f"{namespace}:version"
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: K) -> str:
+        return f"{self._namespace}:{key}"
+
+    async def get(self, key: K) -> V | None:
+        if (data := await self._client.get(self._key(key))) is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        value = json.loads(data)
+        return value if self._model is None else self._model.model_validate(value)
+
+    async def set(self, key: K, value: V, ttl: float | None = None, version: int | None = None):
+        if (milliseconds := int((self.ttl if ttl is None else ttl) * 1000)) <= 0:
+            return
+        data = to_json(value)
+        if version is None:
+            await self._client.set(self._key(key), data, px=milliseconds)
+            return
+
+        # the value is stored only if the version does not change until the transaction is executed
+        async with self._client.pipeline() as pipe:
+            try:
+                await pipe.watch(self._version_key)
+                if int(await pipe.get(self._version_key) or 0) != version:
+                    return
+                pipe.multi()
+                pipe.set(self._key(key), data, px=milliseconds)
+                await pipe.execute()
+            except WatchError:
+                pass
+
+    async def invalidate(self, key: K):
+        async with self._client.pipeline() as pipe:
+            pipe.incr(self._version_key)
+            pipe.delete(self._key(key))
+            await pipe.execute()
+
+    async def _entry_keys(self) -> list[bytes]:
+        pattern = f"{self._namespace}:*"
+        return [key async for key in self._client.scan_iter(pattern) if key != self._version_key.encode()]
+
+    async def clear(self):
+        await self._client.incr(self._version_key)
+        if keys := await self._entry_keys():
+            await self._client.delete(*keys)
+
+    async def get_version(self) -> int:
+        return int(await self._client.get(self._version_key) or 0)
+
+    async def size(self) -> int:
+        return len(await self._entry_keys())
@@ -0,0 +1,317 @@
+import asyncio
+import fcntl
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache.base import InvalidationTarget
+from src.models.sql import User, Room, Order, Task, TaskExecutor, ManualTask
+
+
+@dataclass(frozen=True)
+class SnapshotUser:
+    id: int
+    alias: str | None
+    fullname: str | None
+    # executors of the room's orders may have left the room
+    is_member: bool
+
+
+@dataclass(frozen=True)
+class SnapshotTask:
+    id: int
+    name: str
+    start_date: datetime
+    period: int
+    order_id: int | None
+
+
+@dataclass(frozen=True)
+class SnapshotManualTask:
+    id: int
+    name: str
+    order_id: int | None
+    counter: int
+
+
+@dataclass(frozen=True)
+class RoomSnapshot:
+    """The data of a room at its `version` used by the hot read routes."""
+
+    room_id: int
+    version: int
+    users: list[SnapshotUser]
+    # executors of each order by their order numbers
+    orders: dict[int, list[int]]
+    tasks: list[SnapshotTask]
+    manual_tasks: list[SnapshotManualTask]
+
+
+# a slot starts with a counter, which is odd while the slot is written, then the room id, version and payload length
+_SLOT_HEADER = struct.Struct("<IqqI")
+_COUNTS = struct.Struct("<HHHH")
+_STR_LENGTH = struct.Struct("<H")
+_USER = struct.Struct("<q?")
+_ORDER = struct.Struct("<qH")
+_EXECUTOR = struct.Struct("<q")
+# id, start date in microseconds since the epoch, period, order id or -1
+_TASK = struct.Struct("<qqiq")
+# id, order id or -1, counter
+_MANUAL_TASK = struct.Struct("<qqi")
+
+_NONE_STR = 0xFFFF
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _encode_str(value: str | None) -> bytes:
+    if value is None:
+        return _STR_LENGTH.pack(_NONE_STR)
+    data = value.encode()
+    return _STR_LENGTH.pack(len(data)) + data
+
+
+def _decode_str(buffer: memoryview, offset: int) -> tuple[str | None, int]:
+    (length,) = _STR_LENGTH.unpack_from(buffer, offset)
+    offset += _STR_LENGTH.size
+    if length == _NONE_STR:
+        return None, offset
+    return str(buffer[offset : offset + length], "utf-8"), offset + length
+
+
+def encode_snapshot(snapshot: RoomSnapshot) -> bytes:
+    parts = [_COUNTS.pack(len(snapshot.users), len(snapshot.orders), len(snapshot.tasks), len(snapshot.manual_tasks))]
+    for user in snapshot.users:
+        parts += [_USER.pack(user.id, user.is_member), _encode_str(user.alias), _encode_str(user.fullname)]
+    for order_id, executors in snapshot.orders.items():
+        parts.append(_ORDER.pack(order_id, len(executors)))
+        parts += [_EXECUTOR.pack(user_id) for user_id in executors]
+    for task in snapshot.tasks:
+        start_date = (task.start_date - _EPOCH) // timedelta(microseconds=1)
+        order_id = -1 if task.order_id is None else task.order_id
+        parts += [_TASK.pack(task.id, start_date, task.period, order_id), _encode_str(task.name)]
+    for task in snapshot.manual_tasks:
+        order_id = -1 if task.order_id is None else task.order_id
+        parts += [_MANUAL_TASK.pack(task.id, order_id, task.counter), _encode_str(task.name)]
+    return b"".join(parts)
+
+
+def decode_snapshot(room_id: int, version: int, buffer: memoryview) -> RoomSnapshot:
+    users_count, orders_count, tasks_count, manual_tasks_count = _COUNTS.unpack_from(buffer, 0)
+    offset = _COUNTS.size
+    snapshot = RoomSnapshot(room_id, version, [], {}, [], [])
+    for _ in range(users_count):
+        user_id, is_member = _USER.unpack_from(buffer, offset)
+        alias, offset = _decode_str(buffer, offset + _USER.size)
+        fullname, offset = _decode_str(buffer, offset)
+        snapshot.users.append(SnapshotUser(user_id, alias, fullname, is_member))
+    for _ in range(orders_count):
+        order_id, executors_count = _ORDER.unpack_from(buffer, offset)
+        offset += _ORDER.size
+        snapshot.orders[order_id] = [
+            _EXECUTOR.unpack_from(buffer, offset + i * _EXECUTOR.size)[0] for i in range(executors_count)
+        ]
+        offset += executors_count * _EXECUTOR.size
+    for _ in range(tasks_count):
+        task_id, start_date, period, order_id = _TASK.unpack_from(buffer, offset)
+        name, offset = _decode_str(buffer, offset + _TASK.size)
+        start_date = _EPOCH + timedelta(microseconds=start_date)
+        snapshot.tasks.append(SnapshotTask(task_id, name, start_date, period, None if order_id < 0 else order_id))
+    for _ in range(manual_tasks_count):
+        task_id, order_id, counter = _MANUAL_TASK.unpack_from(buffer, offset)
+        name, offset = _decode_str(buffer, offset + _MANUAL_TASK.size)
+        snapshot.manual_tasks.append(SnapshotManualTask(task_id, name, None if order_id < 0 else order_id, counter))
+    return snapshot
+
+
+async def load_room_snapshot(room_id: int, db: AsyncSession) -> RoomSnapshot | None:
+    """
+    `db` must see one snapshot of the database in all its statements, e.g. a session of
+    `session_maker.get_snapshot_session`, otherwise the tables may be read at different commits.
+    """
+    # the version is read first, so the data is at least as new as the version
+    if (version := await db.scalar(select(Room.version).where(Room.id == room_id))) is None:
+        return None
+    executors = (
+        await db.execute(
+            select(TaskExecutor.order_id, TaskExecutor.user_id)
+            .join(Order, Order.id == TaskExecutor.order_id)
+            .where(Order.room_id == room_id)
+            .order_by(TaskExecutor.order_id, TaskExecutor.order_number)
+        )
+    ).all()
+    users = await db.scalars(
+        select(User)
+        .where((User.room_id == room_id) | User.id.in_({user_id for _, user_id in executors}))
+        .order_by(User.id)
+    )
+    orders: dict[int, list[int]] = {
+        order_id: []
+        for order_id in await db.scalars(select(Order.id).where(Order.room_id == room_id).order_by(Order.id))
+    }
+    for order_id, user_id in executors:
+        if (order := orders.get(order_id)) is not None:
+            order.append(user_id)
+    tasks = await db.scalars(select(Task).where(Task.room_id == room_id).order_by(Task.id))
+    manual_tasks = await db.scalars(select(ManualTask).where(ManualTask.room_id == room_id).order_by(ManualTask.id))
+    return RoomSnapshot(
+        room_id=room_id,
+        version=version,
+        users=[SnapshotUser(u.id, u.alias, u.fullname, u.room_id == room_id) for u in users],
+        orders=orders,
+        tasks=[SnapshotTask(t.id, t.name, t.start_date, t.period, t.order_id) for t in tasks],
+        manual_tasks=[SnapshotManualTask(t.id, t.name, t.order_id, t.counter) for t in manual_tasks],
+    )
+
+
+class RoomSnapshotStore(InvalidationTarget[int]):
+    """
+    Snapshots of rooms in a memory-mapped file shared by the workers of a host.
+
+    The file is split into slots of `slot_size` bytes, and a room is stored in the slot `room_id % slots`.
+    Any worker reads the slots, but only the one holding the lock of the file writes them: it reloads
+    the snapshot of a room when the room is invalidated, which other workers notify it about.
+    Readers pass the room's current version, so stale snapshots are never returned.
+    """
+
+    hits: int
+    misses: int
+    _slots: int
+    _slot_size: int
+    _file: int | None
+    _map: mmap.mmap | None
+    _buffer: memoryview | None
+    _is_writer: bool
+    _session_factory: Callable[[], AsyncSession] | None
+    _refreshes: dict[int, asyncio.Task]
+
+    def __init__(self, slots: int, slot_size: int):
+        self.name = "room_snapshots"
+        self.hits = 0
+        self.misses = 0
+        self._slots = slots
+        self._slot_size = slot_size
+        self._file = None
+        self._map = None
+        self._buffer = None
+        self._is_writer = False
+        self._session_factory = None
+        self._refreshes = {}
+
+    @property
+    def is_open(self) -> bool:
+        return self._map is not None
+
+    @property
+    def is_writer(self) -> bool:
+        return self._is_writer
+
+    def open(self, path: str, session_factory: Callable[[], AsyncSession]):
+        """Map the file, creating it if needed; `session_factory` is used to load snapshots if this is the writer."""
+        size = self._slots * self._slot_size
+        self._file = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._file).st_size < size:
+            os.ftruncate(self._file, size)
+        self._map = mmap.mmap(self._file, size)
+        self._buffer = memoryview(self._map)
+        self._session_factory = session_factory
+        self._try_become_writer()
+
+    async def close(self):
+        if not self.is_open:
+            return
+        for refresh in self._refreshes.values():
+            refresh.cancel()
+        await asyncio.gather(*self._refreshes.values(), return_exceptions=True)
+        self._buffer.release()
+        self._map.close()
+        os.close(self._file)  # releases the lock
+        self._file = self._map = self._buffer = None
+        self._is_writer = False
+
+    def _try_become_writer(self):
+        if self._is_writer:
+            return
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        self._is_writer = True
+        # the previous writer may have died in the middle of writing
+        self._map[:] = bytes(len(self._map))
+
+    def read(self, room_id: int, version: int) -> RoomSnapshot | None:
+        if not self.is_open:
+            return None
+        offset = room_id % self._slots * self._slot_size
+        # the writer may change the slot while it is read, then the read is repeated
+        for _ in range(3):
+            counter, slot_room_id, slot_version, length = _SLOT_HEADER.unpack_from(self._buffer, offset)
+            if counter % 2 == 1:
+                continue
+            if slot_room_id != room_id or slot_version != version or length == 0:
+                break
+            start = offset + _SLOT_HEADER.size
+            try:
+                snapshot = decode_snapshot(room_id, version, self._buffer[start : start + length])
+            except (struct.error, UnicodeDecodeError):
+                continue
+            if _SLOT_HEADER.unpack_from(self._buffer, offset)[0] == counter:
+                self.hits += 1
+                return snapshot
+        self.misses += 1
+        return None
+
+    def write(self, snapshot: RoomSnapshot) -> bool:
+        """Store the snapshot if this is the writer and the snapshot fits into a slot."""
+        payload = encode_snapshot(snapshot)
+        if not self._is_writer or len(payload) > self._slot_size - _SLOT_HEADER.size:
+            return False
+        offset = snapshot.room_id % self._slots * self._slot_size
+        counter, slot_room_id, slot_version, _ = _SLOT_HEADER.unpack_from(self._buffer, offset)
+        if slot_room_id == snapshot.room_id and slot_version > snapshot.version:
+            # a later refresh has already finished
+            return False
+        _SLOT_HEADER.pack_into(self._buffer, offset, counter + 1, 0, 0, 0)
+        start = offset + _SLOT_HEADER.size
+        self._buffer[start : start + len(payload)] = payload
+        _SLOT_HEADER.pack_into(self._buffer, offset, counter + 2, snapshot.room_id, snapshot.version, len(payload))
+        return True
+
+    async def refresh(self, room_id: int):
+        async with self._session_factory() as db:
+            snapshot = await load_room_snapshot(room_id, db)
+        if snapshot is not None:
+            self.write(snapshot)
+
+    def schedule_refresh(self, room_id: int):
+        """Reload the snapshot of the room in the background if this is the writer."""
+        if not self.is_open:
+            return
+        # the writer may have exited since the store was opened
+        self._try_become_writer()
+        if self._is_writer and room_id not in self._refreshes:
+            self._refreshes[room_id] = asyncio.create_task(self.refresh(room_id))
+            self._refreshes[room_id].add_done_callback(lambda _: self._refreshes.pop(room_id, None))
+
+    async def invalidate(self, key: int):
+        self.schedule_refresh(key)
+
+    async def clear(self):
+        if self._is_writer:
+            self._map[:] = bytes(len(self._map))
+
+    def size(self) -> int:
+        if not self.is_open:
+            return 0
+        headers = (_SLOT_HEADER.unpack_from(self._buffer, i * self._slot_size) for i in range(self._slots))
+        return sum(1 for *_, length in headers if length > 0)
+
+    def stats(self) -> dict[str, int]:
+        # hits and misses are counted by each worker
+        return {"size": self.size(), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,44 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Shares one in-flight computation between concurrent calls with the same key."""
+
+    _calls: dict[Hashable, asyncio.Future]
+    calls: int
+    coalesced: int
+
+    def __init__(self):
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        if (future := self._calls.get(key)) is not None:
+            self.coalesced += 1
+            # cancellation of a waiting call must not cancel the shared computation
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # mark the exception as retrieved, as there may be no other calls waiting for it
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> dict[str, int]:
+        return {"in_flight": len(self._calls), "calls": self.calls, "coalesced": self.coalesced}
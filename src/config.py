@@ -1,8 +1,9 @@
 from functools import lru_cache, cached_property
-from typing import Annotated
+from typing import Annotated, Literal
 
 import dotenv
 from fastapi import Depends
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 
@@ -30,6 +31,49 @@ class Settings(BaseSettings):
     MAX_ORDERS: int
     MAX_TASKS: int
     INVITATION_LIFESPAN_DAYS: int
+    # seconds between deletions of all expired invitations, the senders' own ones are also deleted on each invite
+    INVITATION_CLEANUP_INTERVAL: float = 3600
+    # URLs of read replicas of the database as a JSON list, read-only routes are served by them in turn;
+    # they require the "redis" cache backend, through which the workers share the users pinned to the primary
+    DB_REPLICA_URLS: list[str] = []
+    # seconds after a change during which the reads of its user go to the primary, so that they see the change
+    DB_REPLICA_PIN_TIME: float = 5
+    # connections kept open by the pool and the additional ones opened under load
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30  # in seconds to wait for a connection before failing the request
+    DB_POOL_RECYCLE: int = -1  # in seconds after which a connection is reopened, -1 to keep it
+    DB_POOL_PRE_PING: bool = False  # check a connection before each checkout
+    # SQLAlchemy's cache of compiled statements, shared by the drivers
+    DB_QUERY_CACHE_SIZE: int = 500
+    # psycopg prepares a statement on the server after it is executed this number of times on a connection,
+    # None disables prepared statements (e.g. behind PgBouncer in transaction mode)
+    PSYCOPG_PREPARE_THRESHOLD: int | None = 5
+    PSYCOPG_PREPARED_MAX: int = 100  # prepared statements kept by a connection
+    # asyncpg prepares every statement, these are the sizes of the caches of prepared statements of a connection
+    # in SQLAlchemy's adapter and in asyncpg itself, 0 disables them (e.g. behind PgBouncer in transaction mode)
+    ASYNCPG_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+    ASYNCPG_STATEMENT_CACHE_SIZE: int = 100
+    # connections of the pool opened on startup, so that the first requests do not wait for them
+    DB_POOL_MIN_SIZE: int = 5
+    ENTITY_CACHE_SIZE: int = 10000
+    ENTITY_CACHE_TTL: float = 300  # in seconds
+    TOKEN_CACHE_SIZE: int = 1024
+    TOKEN_CACHE_TTL: float = 3600  # in seconds
+    DAILY_INFO_CACHE_SIZE: int = 10000
+    UNKNOWN_USER_CACHE_SIZE: int = 10000
+    UNKNOWN_USER_CACHE_TTL: float = 60  # in seconds
+    # "redis" shares the caches of users, rooms and daily info between workers through REDIS_URL
+    CACHE_BACKEND: Literal["memory", "redis"] = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    # the number of the most recently modified rooms whose data is loaded into the caches on startup
+    # and refreshed before it expires, 0 disables the warm-up
+    WARMUP_ROOMS: int = 100
+    WARMUP_REFRESH_MARGIN: float = 30  # in seconds before the entries of the hot rooms expire
+    # a file on a shared memory filesystem (e.g. /dev/shm) to keep snapshots of rooms for all workers of the host
+    ROOM_SNAPSHOTS_PATH: str | None = None
+    ROOM_SNAPSHOTS_SLOTS: int = 4096
+    ROOM_SNAPSHOT_SIZE: int = 16384  # in bytes, rooms with larger snapshots are not stored
 
     _docker_secrets: _DockerSecrets
 
@@ -50,6 +94,14 @@ class Settings(BaseSettings):
         super().__init__(_env_file=None)
         self._docker_secrets = _DockerSecrets()
 
+    @model_validator(mode="after")
+    def check_replicas_cache_backend(self) -> "Settings":
+        # with per-worker caches, the next read of a user who has changed something may be served
+        # by another worker, which does not know the user is pinned to the primary
+        if self.DB_REPLICA_URLS and self.CACHE_BACKEND != "redis":
+            raise ValueError("DB_REPLICA_URLS requires CACHE_BACKEND=redis")
+        return self
+
 
 @lru_cache
 def get_settings():
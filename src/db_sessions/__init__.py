@@ -1,3 +1,3 @@
-from src.db_sessions.sqlalchemy_session import DB_SESSION_DEPENDENCY
+from src.db_sessions.sqlalchemy_session import DB_SESSION_DEPENDENCY, read_only
 
-__all__ = ["DB_SESSION_DEPENDENCY"]
+__all__ = ["DB_SESSION_DEPENDENCY", "read_only"]
@@ -0,0 +1,73 @@
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class CheckoutStats:
+    checkouts: int
+    timeouts: int
+    wait_time: float  # in seconds, in total
+    max_wait_time: float  # in seconds
+    max_overflow_used: int
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time = 0
+        self.max_wait_time = 0
+        self.max_overflow_used = 0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_time": self.wait_time,
+            "max_wait_time": self.max_wait_time,
+            "max_overflow_used": self.max_overflow_used,
+        }
+
+
+class MeasuredQueuePool(AsyncAdaptedQueuePool):
+    """
+    The default pool of async engines that also measures how long checkouts wait for a connection,
+    including the time to open a new one or to ping it, and how many overflow connections are used at most.
+    """
+
+    checkout_stats: CheckoutStats
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+
+    def recreate(self) -> "MeasuredQueuePool":
+        # the pool is recreated when the engine is disposed, the statistics are kept
+        pool = super().recreate()
+        pool.checkout_stats = self.checkout_stats
+        return pool
+
+    def connect(self):
+        stats = self.checkout_stats
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            wait_time = time.perf_counter() - start
+            stats.wait_time += wait_time
+            stats.max_wait_time = max(stats.max_wait_time, wait_time)
+        stats.checkouts += 1
+        stats.max_overflow_used = max(stats.max_overflow_used, self.overflow())
+        return connection
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "size": self.size(),
+            "in_use": self.checkedout(),
+            "idle": self.checkedin(),
+            # the counter starts from -size and grows with each opened connection
+            "overflow": max(self.overflow(), 0),
+            **self.checkout_stats.stats(),
+        }
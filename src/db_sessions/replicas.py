@@ -0,0 +1,44 @@
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.cache import primary_pins
+
+
+class RoutingSession(Session):
+    """
+    Session of read-only routes: runs the statements on the replica put into its `info` when it is created,
+    unless the user of the request is pinned to the primary to see their own recent changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if reads_replica(self):
+            return self.info["replica"].sync_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+def reads_replica(db: AsyncSession | Session) -> bool:
+    """
+    Whether the statements of the session run on a replica, which may lag behind the primary.
+    What is read from a replica must not be put into the caches, it would outlive the invalidations.
+    """
+    return db.info.get("replica") is not None and not db.info.get("pinned_to_primary")
+
+
+async def check_primary_pin(db: AsyncSession, user_id: int):
+    """Route the session to the primary if the user has changed something recently; call before the first query."""
+    db.info.setdefault("user_ids", set()).add(user_id)
+    if db.info.get("replica") is not None and await primary_pins.get(user_id):
+        db.info["pinned_to_primary"] = True
+
+
+async def pin_to_primary(db: AsyncSession):
+    """After a commit, send the reads of the users of the session to the primary until the replicas catch up."""
+    if db.info.pop("committed", False):
+        for user_id in db.info.get("user_ids", ()):
+            await primary_pins.set(user_id, True)
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session: Session):
+    session.info["committed"] = True
@@ -1,33 +1,206 @@
-from typing import Annotated
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Annotated, AsyncIterator, Callable, Iterator, TypeVar
 
-from fastapi import Depends
+from fastapi import Depends, Request
+from sqlalchemy import event, make_url
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
+from src.cache import apply_invalidations
 from src.config import get_settings
+from src.db_sessions.pool import MeasuredQueuePool
+from src.db_sessions.replicas import RoutingSession, pin_to_primary
+
+Endpoint = TypeVar("Endpoint", bound=Callable)
+
+
+def create_engine(url: str, **engine_options) -> AsyncEngine:
+    """Create an engine with the prepared statements of its driver configured by the settings."""
+    settings = get_settings()
+    driver = make_url(url).get_driver_name()
+    connect_args = {}
+    if driver == "asyncpg":
+        connect_args = {
+            "prepared_statement_cache_size": settings.ASYNCPG_PREPARED_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.ASYNCPG_STATEMENT_CACHE_SIZE,
+        }
+    elif driver == "psycopg":
+        connect_args = {"prepare_threshold": settings.PSYCOPG_PREPARE_THRESHOLD}
+    engine = create_async_engine(
+        url, connect_args={**connect_args, **engine_options.pop("connect_args", {})}, **engine_options
+    )
+
+    if driver == "psycopg":
+        # noinspection PyUnusedLocal
+        @event.listens_for(engine.sync_engine, "connect")
+        def set_prepared_max(dbapi_connection, connection_record):
+            # not a parameter of the connection
+            dbapi_connection.driver_connection.prepared_max = settings.PSYCOPG_PREPARED_MAX
+
+    return engine
 
 
 class SqlAlchemySessionMaker:
-    _engine: AsyncEngine
-    _session_maker: async_sessionmaker
+    """
+    The engine is created by the application's lifespan, or on first use otherwise (e.g. in tests and scripts),
+    so that importing the application does not connect to or configure the database.
+    """
+
+    _engine: AsyncEngine | None
+    _replica_engines: list[AsyncEngine]
+    _replicas: Iterator[AsyncEngine] | None
+    _session_maker: async_sessionmaker | None
+    _read_session_maker: async_sessionmaker | None
+    _snapshot_session_maker: async_sessionmaker | None
+
+    def __init__(self):
+        self._engine = None
+        self._replica_engines = []
+        self._replicas = None
+        self._session_maker = None
+        self._read_session_maker = None
+        self._snapshot_session_maker = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            self.start()
+        return self._engine
+
+    @property
+    def replica_engines(self) -> list[AsyncEngine]:
+        return self._replica_engines
+
+    @property
+    def has_replicas(self) -> bool:
+        return bool(self._replica_engines)
+
+    def start(self, url: str | None = None, replica_urls: list[str] | None = None, **engine_options):
+        """
+        Create the engines of the primary and the replicas, by default those of the settings,
+        with the pool configured by the settings unless `engine_options` override it.
+        """
+        if self._engine is not None:
+            return
+        settings = get_settings()
+        engine_options = {
+            "query_cache_size": settings.DB_QUERY_CACHE_SIZE,
+            "poolclass": MeasuredQueuePool,
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+            **engine_options,
+        }
+        self._engine = create_engine(url or settings.DB_URL, **engine_options)
+        self._session_maker = async_sessionmaker(self._engine, expire_on_commit=False)
+        self._read_session_maker = async_sessionmaker(
+            self._engine.execution_options(isolation_level="AUTOCOMMIT"),
+            sync_session_class=RoutingSession,
+            expire_on_commit=False,
+            autoflush=False,
+        )
+        self._snapshot_session_maker = async_sessionmaker(
+            self._engine.execution_options(isolation_level="REPEATABLE READ"), expire_on_commit=False
+        )
+        replica_urls = settings.DB_REPLICA_URLS if replica_urls is None else replica_urls
+        self._replica_engines = [
+            create_engine(replica_url, **engine_options).execution_options(isolation_level="AUTOCOMMIT")
+            for replica_url in replica_urls
+        ]
+        self._replicas = itertools.cycle(self._replica_engines)
 
-    def __init__(self, e: AsyncEngine):
-        self._engine = e
-        self._session_maker = async_sessionmaker(e, expire_on_commit=False)
+    async def dispose(self):
+        """Close the connections of the pool; a later use creates a new engine."""
+        if self._engine is None:
+            return
+        await self._engine.dispose()
+        for replica in self._replica_engines:
+            await replica.dispose()
+        self._engine = self._session_maker = self._read_session_maker = self._snapshot_session_maker = None
+        self._replicas = None
+        self._replica_engines = []
+
+    def pool_stats(self) -> dict[str, float]:
+        if self._engine is None or not isinstance(pool := self._engine.pool, MeasuredQueuePool):
+            return {}
+        return pool.stats()
 
     def get_session(self) -> AsyncSession:
+        self.start()
         return self._session_maker()
 
+    def get_read_session(self) -> AsyncSession:
+        """
+        A session for reading only: its connection is in autocommit mode, so no BEGIN and ROLLBACK
+        are sent, and nothing is flushed. Each statement sees the data committed before it.
+        If there are replicas, the session reads from the next of them, see `RoutingSession`.
+        """
+        self.start()
+        return self._read_session_maker(info={"replica": next(self._replicas, None)})
 
-engine = create_async_engine(get_settings().DB_URL)
-session_maker = SqlAlchemySessionMaker(engine)
+    def get_snapshot_session(self) -> AsyncSession:
+        """
+        A session of the primary whose transaction is REPEATABLE READ: all its statements see the data
+        committed before the first of them, so the rows read by several statements are consistent.
+        """
+        self.start()
+        return self._snapshot_session_maker()
 
+    @asynccontextmanager
+    async def get_transaction_session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Yields a session running inside one outer transaction, which is committed on exit
+        or rolled back if an exception is raised. Commits of the session only release savepoints.
+        """
+        async with self.engine.connect() as connection, connection.begin():
+            async with self._session_maker(bind=connection, join_transaction_mode="create_savepoint") as session:
+                session.info["in_outer_transaction"] = True
+                yield session
 
-async def get_session_dependency() -> AsyncSession:
-    async with session_maker.get_session() as session:
+    async def prewarm(self, connections: int):
+        """Open `connections` connections of the pool at once, so that the first requests do not wait for them."""
+        opened = [self.engine.connect() for _ in range(connections)]
+        try:
+            await asyncio.gather(*(connection.start() for connection in opened))
+        finally:
+            # the connections are returned to the pool
+            await asyncio.gather(*(connection.close() for connection in opened), return_exceptions=True)
+
+
+session_maker = SqlAlchemySessionMaker()
+
+
+def read_only(endpoint: Endpoint) -> Endpoint:
+    """Mark a route that does not change the database, the dependencies of its request share a read-only session."""
+    endpoint.read_only = True
+    return endpoint
+
+
+async def get_session_dependency(request: Request) -> AsyncIterator[AsyncSession]:
+    # sub-requests of a batch share the session of the batch
+    if (session := getattr(request.state, "db_session", None)) is not None:
         yield session
+        return
+
+    if getattr(request.scope["route"].endpoint, "read_only", False):
+        async with session_maker.get_read_session() as session:
+            yield session
+        return
+
+    async with session_maker.get_session() as session:
+        try:
+            yield session
+        finally:
+            # before the response is sent, so that the next request of the client does not see stale data
+            await apply_invalidations(session)
+            if session_maker.has_replicas:
+                await pin_to_primary(session)
 
 
 DB_SESSION_DEPENDENCY = Annotated[AsyncSession, Depends(get_session_dependency)]
 
 
-__all__ = ["DB_SESSION_DEPENDENCY", "session_maker"]
+__all__ = ["DB_SESSION_DEPENDENCY", "read_only", "session_maker"]
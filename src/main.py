@@ -1,19 +1,76 @@
+import asyncio
 import os
 import time
+from contextlib import asynccontextmanager
+from datetime import datetime
 
 import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.openapi.utils import get_openapi
+from sqlalchemy import make_url
 from starlette.responses import RedirectResponse
 
 from src.api.routes.bot import bot_router
-from src.api.exception_handlers import error_printing
+from src.api.routes.metrics import router as metrics_router
+from src.api.exception_handlers import error_printing, not_modified
+from src.api.exceptions import NotModifiedException
+from src.api.cleanup import clean_up_periodically
+from src.api.warmup import warm_up, keep_warm
+from src.cache import invalidation_targets, listen_for_invalidations, room_snapshots
+from src.config import get_settings
+from src.db_sessions.sqlalchemy_session import session_maker
 
-app = FastAPI()
+# seconds to wait for each step of the warm-up on startup
+WARMUP_TIMEOUT = 30
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    settings = get_settings()
+    session_maker.start(settings.DB_URL)
+    try:
+        await asyncio.wait_for(session_maker.prewarm(settings.DB_POOL_MIN_SIZE), WARMUP_TIMEOUT)
+    except Exception as e:
+        # the connections are opened by the first requests instead
+        print(f"Pool pre-warm failed: {e!r}")
+    if settings.ROOM_SNAPSHOTS_PATH is not None:
+        room_snapshots.open(settings.ROOM_SNAPSHOTS_PATH, session_maker.get_snapshot_session)
+    # the caches kept by each worker are invalidated by the changes committed in other workers
+    url = make_url(settings.DB_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+    listener_connected = asyncio.Event()
+    listener = asyncio.create_task(listen_for_invalidations(url, invalidation_targets, listener_connected))
+    tasks = [listener, asyncio.create_task(clean_up_periodically())]
+    if settings.WARMUP_ROOMS > 0:
+        # the listener clears the caches when it connects, so they are filled after that
+        try:
+            await asyncio.wait_for(listener_connected.wait(), WARMUP_TIMEOUT)
+            daily_info_expires_at = await asyncio.wait_for(warm_up(), WARMUP_TIMEOUT)
+        except Exception as e:
+            # e.g. the database or Redis is unavailable: the application starts cold,
+            # the caches are filled by requests and the refreshes
+            print(f"Warm-up failed: {e!r}")
+            daily_info_expires_at = datetime.now()
+        tasks.append(asyncio.create_task(keep_warm(daily_info_expires_at)))
+    yield
+    for task in tasks:
+        task.cancel()
+    # a failed task must not prevent the resources from being released
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, Exception):
+            print(f"Background task failed: {result!r}")
+    try:
+        await room_snapshots.close()
+    finally:
+        await session_maker.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_exception_handler(HTTPException, error_printing)
+app.add_exception_handler(NotModifiedException, not_modified)
 
 app.include_router(bot_router)
+app.include_router(metrics_router)
 
 
 @app.get("/")
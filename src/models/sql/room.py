@@ -1,3 +1,6 @@
+from datetime import datetime
+
+from sqlalchemy import func
 from sqlmodel import SQLModel, Field
 
 # if typing.TYPE_CHECKING:
@@ -12,6 +15,12 @@ class Room(SQLModel, table=True):
 
     id: int = Field(primary_key=True)
     name: str
+    # incremented by every change of the room's tasks, orders, rules, members and invitations
+    version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    # the time of the last change, the caches are warmed up with the most recently modified rooms
+    modified_at: datetime = Field(
+        default_factory=datetime.now, index=True, sa_column_kwargs={"server_default": func.now()}
+    )
 
     # users: list["User"] = Relationship(back_populates="room", sa_relationship_kwargs={"lazy": "joined"})
     # invitations: list["Invitation"] = Relationship(back_populates="room", sa_relationship_kwargs={"lazy": "joined"})
@@ -22,4 +31,6 @@ class Room(SQLModel, table=True):
         super().__init__(id=id_, name=name)
 
     def __repr__(self):
-        return f"Room(id={self.id}, name={repr(self.name)})"
+        return (
+            f"Room(id={self.id}, name={repr(self.name)}, version={self.version}, modified_at={repr(self.modified_at)})"
+        )
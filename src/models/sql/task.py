@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, ColumnElement, Integer, cast, func, literal
 from sqlmodel import SQLModel, Field
 
 # if typing.TYPE_CHECKING:
@@ -55,3 +55,32 @@ class Task(SQLModel, table=True):
 
     def get_today_executor_index(self, now: datetime, executors_count: int) -> int:
         return (now - self.start_date).days // self.period % executors_count
+
+    def get_next_day_start(self, now: datetime) -> datetime:
+        """The moment after `now` when the task's day, and thus its duty and executor, may change."""
+        if self.start_date > now:
+            return self.start_date
+        return self.start_date + timedelta(days=(now - self.start_date).days + 1)
+
+    @classmethod
+    def days_passed_clause(cls, now: datetime) -> ColumnElement[int]:
+        """SQL counterpart of `(now - task.start_date).days`."""
+        return cast(func.floor(func.extract("epoch", literal(now) - cls.start_date) / 86400), Integer)
+
+    @classmethod
+    def is_active_clause(cls, now: datetime) -> ColumnElement[bool]:
+        """SQL counterpart of `not task.is_inactive()`."""
+        return cls.order_id.is_not(None) & (cls.start_date <= now)
+
+    @classmethod
+    def is_today_duty_clause(cls, now: datetime) -> ColumnElement[bool]:
+        """SQL counterpart of `task.is_today_duty(now)`."""
+        return cls.days_passed_clause(now) % cls.period == 0
+
+    @classmethod
+    def today_executor_index_clause(cls, now: datetime, executors_count: ColumnElement[int]) -> ColumnElement[int]:
+        """SQL counterpart of `task.get_today_executor_index(now, executors_count)`.
+
+        Evaluates to NULL for an order without executors instead of failing with a division by zero.
+        """
+        return cls.days_passed_clause(now) // cls.period % func.nullif(executors_count, 0)
@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel
 
 
@@ -19,6 +21,13 @@ class DailyInfoResponse(BaseModel):
     user_info: dict[int, UserInfo]
 
 
+class DailyInfo(BaseModel):
+    """A daily info response with the moment when it changes unless the room is modified."""
+
+    response: DailyInfoResponse
+    expires_at: datetime
+
+
 class IncomingInvitationInfo(BaseModel):
     id: int
     sender: UserInfo
@@ -1,3 +1,4 @@
+import time
 from datetime import timedelta, datetime
 
 from fastapi.testclient import TestClient
@@ -39,3 +40,20 @@ def test_bot_access_denied():
     response = client.get("/test_bot_access", headers={"X-Token": token})
     assert response.status_code == 403 and isinstance(response.json(), dict) and "code" in response.json()
     assert response.json()["code"] == 11
+
+
+def test_bot_access_invalid_token():
+    token = create_jwt({"sub": "tgbot"}, expires_delta=timedelta(seconds=30))
+    for _ in range(2):
+        response = client.get("/test_bot_access", headers={"X-Token": token[:-1]})
+        assert response.status_code == 401 and response.json()["code"] == 2
+
+
+def test_bot_access_cached_token_expired():
+    token = create_jwt({"sub": "tgbot"}, expires_delta=timedelta(seconds=1))
+    response = client.get("/test_bot_access", headers={"X-Token": token})
+    assert response.status_code == 200 and response.json() == "ok"
+
+    time.sleep(1.5)
+    response = client.get("/test_bot_access", headers={"X-Token": token})
+    assert response.status_code == 401 and response.json()["code"] == 3
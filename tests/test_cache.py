@@ -0,0 +1,246 @@
+import asyncio
+import json
+from contextlib import suppress
+from datetime import datetime, timedelta
+
+import psycopg
+import pytest
+import pytest_asyncio
+from sqlalchemy import make_url, select
+
+from src.api.routes.bot.room import get_daily_info_from_snapshot
+from src.cache import Cache, MemoryCache, RoomSnapshot, RoomSnapshotStore, invalidate_cached, listen_for_invalidations
+from src.cache.invalidation import INVALIDATION_CHANNEL, MAX_PAYLOAD_SIZE, pack_invalidations
+from src.cache.room_snapshots import SnapshotUser, SnapshotTask, SnapshotManualTask
+from src.config import get_settings
+from src.db_sessions.sqlalchemy_session import session_maker
+from src.models.sql import Room
+from src.schemas.method_output_schemas import DailyInfoResponse, TaskDailyInfo, UserInfo
+
+
+@pytest_asyncio.fixture(params=["memory", "redis"])
+async def cache(request) -> Cache:
+    if request.param == "memory":
+        yield MemoryCache(max_size=2, ttl=60)
+        return
+
+    fakeredis = pytest.importorskip("fakeredis")
+    from src.cache.redis_cache import RedisCache
+
+    client = fakeredis.FakeAsyncRedis()
+    yield RedisCache(client, "test", ttl=60)
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cache_get_set(cache: Cache):
+    assert await cache.get(1) is None
+    await cache.set(1, {"id": 1, "name": "a"})
+    assert await cache.get(1) == {"id": 1, "name": "a"}
+    assert await cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+    await cache.set(2, "b", ttl=0.05)
+    await asyncio.sleep(0.1)
+    assert await cache.get(2) is None
+
+
+@pytest.mark.asyncio
+async def test_cache_invalidation(cache: Cache):
+    await cache.set(1, "a")
+    await cache.set(2, "b")
+    version = await cache.get_version()
+
+    await cache.invalidate(1)
+    assert await cache.get(1) is None and await cache.get(2) == "b"
+    assert await cache.get_version() != version
+
+    # a value computed before the invalidation is not stored
+    await cache.set(1, "stale", version=version)
+    assert await cache.get(1) is None
+    await cache.set(1, "fresh", version=await cache.get_version())
+    assert await cache.get(1) == "fresh"
+
+    await cache.clear()
+    assert await cache.get(1) is None and await cache.get(2) is None
+    assert (await cache.stats())["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_values():
+    fakeredis = pytest.importorskip("fakeredis")
+    from src.cache.redis_cache import RedisCache
+
+    client = fakeredis.FakeAsyncRedis()
+    rooms, daily_info = RedisCache(client, "rooms", ttl=60), RedisCache(client, "daily_info", 60, DailyInfoResponse)
+    try:
+        room = Room(1, "room1")
+        await rooms.set(1, room.model_dump())
+        # values are stored as JSON, the dependencies restore the rows with `model_validate`
+        assert json.loads(await client.get("rooms:1"))["name"] == "room1"
+        assert Room.model_validate(await rooms.get(1)) == room
+
+        response = DailyInfoResponse(
+            periodic_tasks=[],
+            manual_tasks=[TaskDailyInfo(id=1, name="a", today_executor=2)],
+            user_info={2: UserInfo(id=2, alias=None, fullname="b")},
+        )
+        await daily_info.set(1, response)
+        assert await daily_info.get(1) == response
+    finally:
+        await client.aclose()
+
+
+async def wait_until_invalidated(cache: Cache, key: int) -> bool:
+    for _ in range(100):
+        if await cache.get(key) is None:
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+@pytest.mark.asyncio
+async def test_listen_for_invalidations():
+    cache = MemoryCache(max_size=10, ttl=60, name="test")
+    url = make_url(get_settings().DB_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+    listener = asyncio.create_task(listen_for_invalidations(url, [cache]))
+    try:
+        # the listener clears the cache once it is connected
+        await cache.set(1, "a")
+        assert await wait_until_invalidated(cache, 1)
+
+        await cache.set(1, "a")
+        await cache.set(2, "b")
+        async with session_maker.get_session() as db:
+            await db.execute(select(1))
+            invalidate_cached(db, cache, 1)
+            await db.rollback()
+            invalidate_cached(db, cache, 2)
+            await db.commit()
+        assert await wait_until_invalidated(cache, 2)
+        assert await cache.get(1) == "a"
+    finally:
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+
+
+def test_pack_invalidations():
+    rooms, daily_info, users = (
+        MemoryCache(max_size=10, ttl=60, name=name) for name in ("rooms", "daily_info", "users")
+    )
+    invalidations = [(rooms, 1), (daily_info, 1), (rooms, 2), (daily_info, 2), (users, 5), (rooms, 1)]
+    assert pack_invalidations(invalidations) == ["daily_info,rooms:1,2;users:5"]
+    assert pack_invalidations([]) == []
+
+    payloads = pack_invalidations([(rooms, key) for key in range(5000)])
+    assert len(payloads) > 1 and all(len(payload) <= MAX_PAYLOAD_SIZE for payload in payloads)
+    assert sorted(int(key) for payload in payloads for key in payload.removeprefix("rooms:").split(",")) == list(
+        range(5000)
+    )
+
+
+@pytest.mark.asyncio
+async def test_notify_once_per_transaction():
+    rooms, daily_info = MemoryCache(max_size=10, ttl=60, name="rooms"), MemoryCache(max_size=10, ttl=60, name="info")
+    url = make_url(get_settings().DB_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+    async with await psycopg.AsyncConnection.connect(url, autocommit=True) as connection:
+        await connection.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+        async with session_maker.get_session() as db:
+            for room_id in (1, 2):
+                invalidate_cached(db, rooms, room_id)
+                invalidate_cached(db, daily_info, room_id)
+            await db.commit()
+        payloads = [notification.payload async for notification in connection.notifies(timeout=0.5)]
+    assert payloads == ["info,rooms:1,2"]
+
+
+@pytest.mark.asyncio
+async def test_listener_reconnects():
+    class FailingOnce(MemoryCache):
+        failed = False
+
+        async def invalidate(self, key):
+            if not self.failed:
+                self.failed = True
+                raise RuntimeError("invalidation failed")
+            await super().invalidate(key)
+
+    cache = FailingOnce(max_size=10, ttl=60, name="test")
+    url = make_url(get_settings().DB_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+    connected = asyncio.Event()
+    listener = asyncio.create_task(listen_for_invalidations(url, [cache], connected))
+    try:
+        await connected.wait()
+        await cache.set(1, "a")
+        await cache.set(2, "b")
+        async with session_maker.get_session() as db:
+            await db.execute(select(1))
+            invalidate_cached(db, cache, 1)
+            await db.commit()
+        # the listener clears the cache when it reconnects after the failure
+        assert await wait_until_invalidated(cache, 2)
+        assert not listener.done()
+    finally:
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+
+
+def make_snapshot(room_id: int, version: int) -> RoomSnapshot:
+    return RoomSnapshot(
+        room_id=room_id,
+        version=version,
+        users=[SnapshotUser(1, "alias1", None, True), SnapshotUser(2, None, "имя", False)],
+        orders={10: [2, 1, 2], 11: []},
+        tasks=[
+            SnapshotTask(20, "task", datetime(2024, 3, 1, 12, 30, 15, 500), 3, 10),
+            SnapshotTask(21, "", datetime(2024, 1, 1), 1, None),
+        ],
+        manual_tasks=[SnapshotManualTask(30, "manual", 10, 2)],
+    )
+
+
+def test_daily_info_inconsistent_snapshot():
+    now = datetime.now()
+
+    def daily_info(orders: dict[int, list[int]]):
+        tasks = [SnapshotTask(20, "task", now - timedelta(days=1), 1, 10)]
+        snapshot = RoomSnapshot(1, 1, [SnapshotUser(1, "alias1", None, True)], orders, tasks, [])
+        return get_daily_info_from_snapshot(snapshot, now)
+
+    # the snapshot lacks the task's order or its executor, so the database computes the response
+    assert daily_info({}) is None
+    assert daily_info({10: [2]}) is None
+    assert daily_info({10: [1]}).response.periodic_tasks == [TaskDailyInfo(id=20, name="task", today_executor=1)]
+
+
+@pytest.mark.asyncio
+async def test_room_snapshot_store(tmp_path):
+    path = str(tmp_path / "room_snapshots")
+    writer, reader = RoomSnapshotStore(slots=4, slot_size=1024), RoomSnapshotStore(slots=4, slot_size=1024)
+    writer.open(path, session_maker.get_snapshot_session)
+    reader.open(path, session_maker.get_snapshot_session)
+    try:
+        assert writer.is_writer and not reader.is_writer
+        assert not reader.write(make_snapshot(1, 1))
+
+        assert writer.write(snapshot := make_snapshot(1, 1))
+        assert reader.read(1, 1) == snapshot
+        # another version or another room in the same slot
+        assert reader.read(1, 2) is None and reader.read(5, 1) is None
+        # an older snapshot does not replace a newer one
+        assert not writer.write(make_snapshot(1, 0))
+        assert writer.write(make_snapshot(5, 0)) and reader.read(5, 0) == make_snapshot(5, 0)
+        assert reader.size() == 1
+
+        # a snapshot larger than a slot is not stored
+        large = RoomSnapshot(2, 1, [SnapshotUser(i, "a" * 20, None, True) for i in range(100)], {}, [], [])
+        assert not writer.write(large) and reader.read(2, 1) is None
+
+        # the reader takes over the file when the writer exits
+        await writer.close()
+        await reader.invalidate(1)
+        assert reader.is_writer and reader.read(5, 0) is None
+    finally:
+        await writer.close()
+        await reader.close()
@@ -1,17 +1,25 @@
+from contextlib import contextmanager
 from datetime import timedelta, datetime
 
 import pytest
 import pytest_asyncio
+import sqlalchemy.exc
 from fastapi.testclient import TestClient
 from httpx import Response
-from sqlalchemy import delete, text, exists, select
+from pydantic import ValidationError
+from sqlalchemy import delete, text, exists, select, event
+from sqlalchemy.ext.asyncio import AsyncEngine
 
 from src.api.auth.utils import create_jwt
-from src.config import get_settings
+from src.cache import clear_caches, daily_info_cache, room_snapshots
+from src.config import Settings, get_settings
+from src.db_sessions import DB_SESSION_DEPENDENCY
 from src.db_sessions.sqlalchemy_session import session_maker
 from src.main import app
 from src.models.sql import User, Room, Task, Order, TaskExecutor, Invitation, Rule
 from src.api.routes.bot.periodic_task.output_schemas import TaskInfoResponse
+from src.api.warmup import get_active_room_ids
+from src.api.cleanup import delete_all_expired_invitations
 
 client = TestClient(app)
 
@@ -22,6 +30,42 @@ def post(url: str, json: dict) -> Response:
     return client.post(url, json=json, headers={"X-Token": TOKEN})
 
 
+def get(url: str, user_id: int, headers: dict | None = None) -> Response:
+    return client.get(url, headers={"X-Token": TOKEN, "X-User-Id": str(user_id), **(headers or {})})
+
+
+@contextmanager
+def count_statements(engine: AsyncEngine | None = None):
+    statements = []
+
+    # noinspection PyUnusedLocal
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = (engine or session_maker.engine).sync_engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def record_isolation_levels():
+    levels = []
+
+    # noinspection PyUnusedLocal
+    def before_cursor_execute(conn, *args):
+        levels.append(conn.get_execution_options().get("isolation_level"))
+
+    engine = session_maker.engine.sync_engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield levels
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
 async def clear_db():
     async with session_maker.get_session() as session:
         for model in (Invitation, TaskExecutor, Order, Task, Room, User):
@@ -81,6 +125,8 @@ async def setup_data_in_db():
         yield
 
         await clear_db()
+        # rows are also written directly in tests, bypassing the invalidation done by the routes
+        await clear_caches()
 
 
 @pytest_asyncio.fixture(scope="session", autouse=True)
@@ -752,6 +798,11 @@ async def test_create_order():
         await db.commit()
     r = post("/bot/order/create", {"user_id": 1001, "order": {"users": [1002, 1001]}})
     assert r.status_code == 200 and isinstance(r.json(), int)
+    async with session_maker.get_session() as db:
+        executors = await db.scalars(
+            select(TaskExecutor.user_id).where(TaskExecutor.order_id == r.json()).order_by(TaskExecutor.order_number)
+        )
+        assert list(executors) == [1002, 1001]
 
 
 @pytest.mark.asyncio
@@ -936,6 +987,77 @@ def test_daily_info():
     )
 
 
+def test_daily_info_cache():
+    _, _, _, _, _, manual = setup_some_tasks()
+    r = post("/bot/room/daily_info", {"user_id": 1001})
+    assert r.json()["manual_tasks"] == [{"id": manual, "name": "manual_task_1", "today_executor": 1001}]
+    with count_statements() as statements:
+        assert post("/bot/room/daily_info", {"user_id": 1001}).json() == r.json()
+    assert len(statements) == 0
+
+    post("/bot/manual_task/do", {"user_id": 1001, "task_id": manual})
+    r = post("/bot/room/daily_info", {"user_id": 1001})
+    assert r.json()["manual_tasks"] == [{"id": manual, "name": "manual_task_1", "today_executor": 1002}]
+
+
+@pytest.mark.asyncio
+async def test_daily_info_room_snapshot(tmp_path):
+    setup_some_tasks()
+    daily_info = post("/bot/room/daily_info", {"user_id": 1001}).json()
+    room_info = post("/bot/room/info", {"user_id": 1001}).json()
+
+    room_snapshots.open(str(tmp_path / "room_snapshots"), session_maker.get_snapshot_session)
+    try:
+        await room_snapshots.refresh(room_info["id"])
+        await daily_info_cache.clear()
+        with count_statements() as statements:
+            assert post("/bot/room/daily_info", {"user_id": 1001}).json() == daily_info
+            r = post("/bot/room/info", {"user_id": 1001}).json()
+        assert len(statements) == 0
+        assert sorted(r["users"], key=lambda u: u["id"]) == sorted(room_info["users"], key=lambda u: u["id"])
+    finally:
+        await room_snapshots.close()
+
+
+@pytest.mark.asyncio
+async def test_warm_up():
+    setup_some_tasks()
+    room_id = post("/bot/room/info", {"user_id": 1001}).json()["id"]
+    daily_info = post("/bot/room/daily_info", {"user_id": 1001}).json()
+    async with session_maker.get_session() as db:
+        assert (await get_active_room_ids(db, 1)) == [room_id]
+
+    await clear_caches()
+    # the lifespan runs the warm-up before the first request
+    with TestClient(app) as warm_client:
+        with count_statements() as statements:
+            r = warm_client.post("/bot/room/daily_info", json={"user_id": 1001}, headers={"X-Token": TOKEN})
+    assert r.json() == daily_info
+    assert len(statements) == 0
+
+
+def test_warm_up_failure(monkeypatch):
+    async def fail():
+        raise sqlalchemy.exc.TimeoutError("pool checkout timed out")
+
+    monkeypatch.setattr("src.main.warm_up", fail)
+    # the application starts cold and stops cleanly
+    with TestClient(app) as cold_client:
+        r = cold_client.post("/bot/room/info", json={"user_id": 1}, headers={"X-Token": TOKEN})
+    assert r.status_code == 200
+
+
+def test_listener_failure(monkeypatch):
+    async def fail(_url, _caches, connected):
+        connected.set()
+        raise RuntimeError("listener failed")
+
+    monkeypatch.setattr("src.main.listen_for_invalidations", fail)
+    # the failed task does not prevent the shutdown
+    with TestClient(app) as client_:
+        assert client_.post("/bot/room/info", json={"user_id": 1}, headers={"X-Token": TOKEN}).status_code == 200
+
+
 def test_incoming_invitations():
     inv2 = post("/bot/invitation/create", {"user_id": 2, "addressee": {"alias": "alias3"}}).json()
     r = post("/bot/invitation/inbox", {"user_id": 3})
@@ -951,6 +1073,31 @@ def test_incoming_invitations():
     assert r.status_code == 200 and (len(r.json()["invitations"]) == 0)
 
 
+@pytest.mark.asyncio
+async def test_incoming_invitations_expired():
+    async with session_maker.get_session() as db:
+        db.add(
+            Invitation(
+                1001, 1, "alias3", 1, datetime.now() - timedelta(days=get_settings().INVITATION_LIFESPAN_DAYS + 1)
+            )
+        )
+        await db.commit()
+    r = post("/bot/invitation/inbox", {"user_id": 3})
+    assert r.status_code == 200 and [i["id"] for i in r.json()["invitations"]] == [1]
+
+
+@pytest.mark.asyncio
+async def test_delete_all_expired_invitations():
+    expired = datetime.now() - timedelta(days=get_settings().INVITATION_LIFESPAN_DAYS + 1)
+    async with session_maker.get_session() as db:
+        db.add(Invitation(1001, 1, "alias3", 1, expired))
+        db.add(Invitation(1002, 2, "alias4", 1, expired))
+        await db.commit()
+    await delete_all_expired_invitations()
+    async with session_maker.get_session() as db:
+        assert set(await db.scalars(select(Invitation.id))) == {1, 2}
+
+
 def test_room_info():
     r = post("/bot/room/info", {"user_id": 1})
     assert r.status_code == 200 and (
@@ -964,6 +1111,24 @@ def test_room_info():
     )
 
 
+@pytest.mark.asyncio
+async def test_room_info_statements_count():
+    post("/bot/room/info", {"user_id": 1})
+    with count_statements() as statements:
+        post("/bot/room/info", {"user_id": 1})
+    small_room_count = len(statements)
+
+    async with session_maker.get_session() as db:
+        for i in range(20):
+            db.add(User(1001 + i, 1))
+        await db.commit()
+
+    with count_statements() as statements:
+        r = post("/bot/room/info", {"user_id": 1})
+    assert r.status_code == 200 and len(r.json()["users"]) == 22
+    assert len(statements) == small_room_count
+
+
 @pytest.mark.asyncio
 async def test_leave_room():
     r = post("/bot/room/leave", {"user_id": 1})
@@ -1006,6 +1171,223 @@ def test_get_task_info_active():
     )
 
 
+def test_get_task_info_statements_count():
+    with count_statements() as statements:
+        r = post("/bot/task/info", {"user_id": 1, "task": {"id": 1}})
+    assert r.status_code == 200
+    # the user with their room and the room-scoped task
+    assert len(statements) == 2
+
+
+def test_user_room_cache():
+    post("/bot/room/info", {"user_id": 1})
+    with count_statements() as statements:
+        r = post("/bot/task/info", {"user_id": 1, "task": {"id": 1}})
+    assert r.status_code == 200 and len(statements) == 1
+    caches = client.get("/metrics", headers={"X-Token": TOKEN}).json()["caches"]
+    assert caches["users"]["hits"] >= 1 and caches["rooms"]["hits"] >= 1
+
+    assert post("/bot/invitation/inbox", {"user_id": 2}).json()["invitations"] == []
+    post("/bot/user/save_alias", {"user_id": 2, "alias": "alias3"})
+    assert len(post("/bot/invitation/inbox", {"user_id": 2}).json()["invitations"]) == 1
+
+    post("/bot/room/leave", {"user_id": 4})
+    r = post("/bot/room/info", {"user_id": 4})
+    assert r.status_code == 400 and r.json()["code"] == 105
+
+
+def test_unknown_user_cache():
+    assert post("/bot/room/info", {"user_id": 1000}).json()["code"] == 102
+    with count_statements() as statements:
+        r = post("/bot/room/info", {"user_id": 1000})
+    assert r.json()["code"] == 102 and len(statements) == 0
+
+    post("/bot/user/create", {"user_id": 1000})
+    r = post("/bot/room/info", {"user_id": 1000})
+    assert r.status_code == 400 and r.json()["code"] == 105
+
+    assert post("/bot/room/info", {"user_id": 1001}).json()["code"] == 102
+    r = post(
+        "/bot/batch",
+        {
+            "operations": [
+                {"path": "/user/create", "body": {"user_id": 1001}},
+                {"path": "/room/create", "body": {"user_id": 1001, "room": {"name": "room1001"}}},
+            ],
+            "atomic": True,
+        },
+    )
+    assert [res["status_code"] for res in r.json()["results"]] == [200, 200]
+    assert post("/bot/room/info", {"user_id": 1001}).json()["name"] == "room1001"
+
+
+def test_room_etag():
+    r = get("/bot/rule/list", 1)
+    assert r.status_code == 200 and (etag := r.headers["ETag"])
+
+    with count_statements() as statements:
+        r = get("/bot/rule/list", 1, {"If-None-Match": f'"0-0", {etag}'})
+    assert r.status_code == 304 and r.headers["ETag"] == etag and r.content == b""
+    assert len(statements) == 0
+
+    # another room's version is not accepted
+    assert get("/bot/rule/list", 4, {"If-None-Match": etag}).status_code == 200
+
+    post("/bot/rule/create", {"user_id": 1, "rule": {"name": "rule2", "text": "text2"}})
+    r = get("/bot/rule/list", 1, {"If-None-Match": etag})
+    assert r.status_code == 200 and len(r.json()) == 2 and r.headers["ETag"] != etag
+
+    etag = r.headers["ETag"]
+    post("/bot/user/save_fullname", {"user_id": 2, "fullname": "new name"})
+    r = get("/bot/room/info", 1, {"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+
+
+def test_room_etag_post():
+    # POST routes take the ids of objects in the body, so they are not tagged and always answer in full
+    etag = get("/bot/order/info/1", 1).headers["ETag"]
+    r = client.post(
+        "/bot/order/info", json={"user_id": 1, "order": {"id": 1}}, headers={"X-Token": TOKEN, "If-None-Match": etag}
+    )
+    assert r.status_code == 200 and "ETag" not in r.headers
+
+
+def test_room_etag_former_executor():
+    etag = get("/bot/room/list_of_orders", 1).headers["ETag"]
+    assert post("/bot/room/leave", {"user_id": 2}).status_code == 200
+    r = get("/bot/room/list_of_orders", 1, {"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+
+    # the user who has left the room still executes its order
+    etag = r.headers["ETag"]
+    post("/bot/user/save_fullname", {"user_id": 2, "fullname": "new name"})
+    r = get("/bot/room/list_of_orders", 1, {"If-None-Match": etag})
+    assert r.status_code == 200 and "new name" in r.text
+
+    etag = r.headers["ETag"]
+    post("/bot/user/save_alias", {"user_id": 2, "alias": "new_alias"})
+    r = get("/bot/room/list_of_orders", 1, {"If-None-Match": etag})
+    assert r.status_code == 200 and "new_alias" in r.text
+
+
+def test_get_routes():
+    for url in ("/bot/room/info", "/bot/room/list_of_orders", "/bot/rule/list", "/bot/manual_task/list"):
+        assert get(url, 1).json() == post(url, {"user_id": 1}).json()
+    assert get("/bot/order/info/1", 1).json() == post("/bot/order/info", {"user_id": 1, "order": {"id": 1}}).json()
+    assert get("/bot/task/info/1", 1).json() == post("/bot/task/info", {"user_id": 1, "task": {"id": 1}}).json()
+    assert (
+        get("/bot/task/current_executor/1", 1).json()
+        == post("/bot/task/current_executor", {"user_id": 1, "task_id": 1}).json()
+    )
+    assert len(get("/bot/invitation/sent", 1).json()["invitations"]) == 2
+
+    r = get("/bot/room/info", 1)
+    assert r.headers["Cache-Control"] == "no-cache" and r.headers["Vary"] == "X-User-Id, X-Token"
+    r = get("/bot/room/info", 1, {"If-None-Match": r.headers["ETag"]})
+    assert r.status_code == 304 and r.headers["Cache-Control"] == "no-cache"
+
+    r = get("/bot/order/info/2", 1)
+    assert r.status_code == 400 and r.json()["code"] == 117
+    assert client.get("/bot/room/info", headers={"X-Token": TOKEN}).status_code == 422
+
+
+def test_get_manual_task_current_executor():
+    *_, manual = setup_some_tasks()
+    r = get(f"/bot/manual_task/current_executor/{manual}", 1001)
+    assert r.json() == post("/bot/manual_task/current_executor", {"user_id": 1001, "task_id": manual}).json()
+    assert r.json()["current"]["user"]["id"] == 1001
+    assert (
+        get(f"/bot/manual_task/current_executor/{manual}", 1001, {"If-None-Match": r.headers["ETag"]}).status_code
+        == 304
+    )
+
+    post("/bot/manual_task/do", {"user_id": 1001, "task_id": manual})
+    r = get(f"/bot/manual_task/current_executor/{manual}", 1001, {"If-None-Match": r.headers["ETag"]})
+    assert r.status_code == 200 and r.json()["current"]["user"]["id"] == 1002
+
+
+def test_expiring_room_etag():
+    task1, _, task_inactive, *_ = setup_some_tasks()
+    urls = (
+        "/bot/room/daily_info",
+        "/bot/task/list",
+        f"/bot/task/info/{task1}",
+        f"/bot/task/info/{task_inactive}",
+        f"/bot/task/current_executor/{task1}",
+    )
+    for url in urls:
+        etag = get(url, 1001).headers["ETag"]
+        with count_statements() as statements:
+            assert get(url, 1001, {"If-None-Match": etag}).status_code == 304
+        assert len(statements) == 0
+
+    # the responses change with time, so a tag is not accepted after the moment it names
+    for url in ("/bot/room/daily_info", "/bot/task/list", f"/bot/task/info/{task_inactive}"):
+        room_id, version, _ = get(url, 1001).headers["ETag"].strip('"').split("-")
+        expired = f'"{room_id}-{version}-{int(datetime.now().timestamp())}"'
+        assert get(url, 1001, {"If-None-Match": expired}).status_code == 200
+
+    # the details of an active task only change with the room
+    assert get(f"/bot/task/info/{task1}", 1001).headers["ETag"].count("-") == 1
+
+    etag = get("/bot/room/daily_info", 1001).headers["ETag"]
+    post("/bot/task/delete", {"user_id": 1001, "task_id": task1})
+    assert get("/bot/room/daily_info", 1001, {"If-None-Match": etag}).status_code == 200
+
+
+def test_invitations_etag():
+    for url in ("/bot/invitation/inbox", "/bot/invitation/sent"):
+        user_id = 3 if url.endswith("inbox") else 1
+        r = get(url, user_id)
+        assert r.status_code == 200 and len(r.json()["invitations"]) > 0
+        r = get(url, user_id, {"If-None-Match": r.headers["ETag"]})
+        assert r.status_code == 304 and r.content == b""
+
+    etag = get("/bot/invitation/inbox", 3).headers["ETag"]
+    post("/bot/invitation/create", {"user_id": 2, "addressee": {"alias": "alias3"}})
+    r = get("/bot/invitation/inbox", 3, {"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+
+
+def test_read_only_session():
+    task1, *_ = setup_some_tasks()
+    with record_isolation_levels() as levels:
+        assert get("/bot/task/list", 1001).status_code == 200
+        assert post("/bot/task/info", {"user_id": 1001, "task": {"id": task1}}).status_code == 200
+        assert get("/bot/rule/list", 1001).status_code == 200
+        assert post("/bot/invitation/inbox", {"user_id": 1001}).status_code == 200
+        assert get("/bot/invitation/sent", 1001).status_code == 200
+    assert levels and all(level == "AUTOCOMMIT" for level in levels)
+
+    with record_isolation_levels() as levels:
+        assert post("/bot/task/delete", {"user_id": 1001, "task_id": task1}).status_code == 200
+    assert levels and "AUTOCOMMIT" not in levels
+
+
+@pytest.mark.asyncio
+async def test_replica_routing():
+    # a replica is emulated by another engine of the same database
+    await session_maker.dispose()
+    session_maker.start(replica_urls=[get_settings().DB_URL])
+    primary, replica = session_maker.engine, session_maker.replica_engines[0]
+    try:
+        with count_statements(primary) as primary_statements, count_statements(replica) as replica_statements:
+            assert len(get("/bot/rule/list", 1).json()) == 1
+        assert len(primary_statements) == 0 and len(replica_statements) > 0
+
+        post("/bot/rule/create", {"user_id": 1, "rule": {"name": "rule", "text": "text"}})
+        # the user who made the change reads it from the primary
+        with count_statements(primary) as primary_statements, count_statements(replica) as replica_statements:
+            assert len(get("/bot/rule/list", 1).json()) == 2
+        assert len(primary_statements) > 0 and len(replica_statements) == 0
+        # other users still read from the replica
+        with count_statements(primary) as primary_statements, count_statements(replica) as replica_statements:
+            assert len(get("/bot/rule/list", 2).json()) == 2
+        assert len(primary_statements) == 0 and len(replica_statements) > 0
+    finally:
+        await session_maker.dispose()
+
+
 def test_get_task_info_inactive():
     r = post("/bot/task/info", {"user_id": 4, "task": {"id": 2}})
     assert r.status_code == 200
@@ -1015,6 +1397,15 @@ def test_get_task_info_inactive():
     )
 
 
+def test_replicas_require_shared_cache(monkeypatch):
+    monkeypatch.setenv("DB_REPLICA_URLS", '["postgresql+psycopg://replica/db"]')
+    monkeypatch.setenv("CACHE_BACKEND", "memory")
+    with pytest.raises(ValidationError, match="CACHE_BACKEND=redis"):
+        Settings()
+    monkeypatch.setenv("CACHE_BACKEND", "redis")
+    assert Settings().DB_REPLICA_URLS == ["postgresql+psycopg://replica/db"]
+
+
 def test_get_sent_invitations():
     r = post("/bot/invitation/sent", {"user_id": 1})
     assert r.status_code == 200 and (
@@ -1024,6 +1415,21 @@ def test_get_sent_invitations():
     )
 
 
+@pytest.mark.asyncio
+async def test_get_sent_invitations_expired():
+    async with session_maker.get_session() as db:
+        db.add(
+            Invitation(1001, 1, "lol", 1, datetime.now() - timedelta(days=get_settings().INVITATION_LIFESPAN_DAYS + 1))
+        )
+        await db.commit()
+    r = post("/bot/invitation/sent", {"user_id": 1})
+    assert r.status_code == 200 and sorted(i["id"] for i in r.json()["invitations"]) == [1, 2]
+
+    post("/bot/invitation/create", {"user_id": 1, "addressee": {"alias": "alias5"}})
+    async with session_maker.get_session() as db:
+        assert await db.get(Invitation, 1001) is None
+
+
 @pytest.mark.asyncio
 async def test_delete_invitation():
     r = post("/bot/invitation/delete", {"user_id": 1, "invitation": {"id": 1}})
@@ -1146,3 +1552,137 @@ def test_task_current_executor():
     }
     r = post("/bot/task/current_executor", {"user_id": 4, "task_id": 2})
     assert r.status_code == 200 and r.json() == {"current": None}
+
+
+def test_batch():
+    r = post(
+        "/bot/batch",
+        {
+            "operations": [
+                {"path": "/room/info", "body": {"user_id": 1}},
+                {"path": "/rule/delete", "body": {"user_id": 1, "rule_id": 0}},
+                {"path": "/rule/list", "body": {"user_id": 1}},
+            ]
+        },
+    )
+    assert r.status_code == 200
+    info, error, rules = r.json()["results"]
+    assert info["status_code"] == 200 and info["result"]["name"] == "room1"
+    assert error["status_code"] == 400 and error["error"]["code"] == 120
+    assert rules["status_code"] == 200 and rules["result"] == [{"id": 1, "name": "rule1", "text": "text1"}]
+
+
+@pytest.mark.asyncio
+async def test_batch_independent():
+    r = post(
+        "/bot/batch",
+        {
+            "operations": [
+                {"path": "/rule/create", "body": {"user_id": 1, "rule": {"name": "a", "text": "a"}}},
+                {"path": "/rule/delete", "body": {"user_id": 1, "rule_id": 0}},
+                {"path": "/rule/create", "body": {"user_id": 1, "rule": {"name": "b", "text": "b"}}},
+            ]
+        },
+    )
+    assert r.status_code == 200 and [res["status_code"] for res in r.json()["results"]] == [200, 400, 200]
+    async with session_maker.get_session() as db:
+        assert set(await db.scalars(select(Rule.name).where(Rule.room_id == 1))) == {"rule1", "a", "b"}
+
+
+@pytest.mark.asyncio
+async def test_batch_atomic():
+    r = post(
+        "/bot/batch",
+        {
+            "operations": [
+                {"path": "/rule/create", "body": {"user_id": 1, "rule": {"name": "a", "text": "a"}}},
+                {"path": "/rule/delete", "body": {"user_id": 1, "rule_id": 0}},
+                {"path": "/rule/create", "body": {"user_id": 1, "rule": {"name": "b", "text": "b"}}},
+            ],
+            "atomic": True,
+        },
+    )
+    assert r.status_code == 200 and [res["status_code"] for res in r.json()["results"]] == [200, 400]
+    async with session_maker.get_session() as db:
+        assert list(await db.scalars(select(Rule.name).where(Rule.room_id == 1))) == ["rule1"]
+
+    r = post(
+        "/bot/batch",
+        {
+            "operations": [
+                {"path": "/rule/create", "body": {"user_id": 1, "rule": {"name": "a", "text": "a"}}},
+                {"path": "/rule/create", "body": {"user_id": 1, "rule": {"name": "b", "text": "b"}}},
+            ],
+            "atomic": True,
+        },
+    )
+    assert r.status_code == 200 and [res["status_code"] for res in r.json()["results"]] == [200, 200]
+    async with session_maker.get_session() as db:
+        assert set(await db.scalars(select(Rule.name).where(Rule.room_id == 1))) == {"rule1", "a", "b"}
+
+
+@contextmanager
+def failing_route():
+    """Register /bot/test/fail, which adds a rule to room 1 and then fails unexpectedly."""
+
+    async def fail(db: DB_SESSION_DEPENDENCY):
+        db.add(Rule(1001, "c", "c", 1))
+        await db.flush()
+        raise RuntimeError("unexpected")
+
+    app.router.add_api_route("/bot/test/fail", fail, methods=["POST"])
+    try:
+        yield
+    finally:
+        app.router.routes.pop()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("atomic", [False, True])
+async def test_batch_unexpected_error(atomic: bool):
+    with failing_route():
+        r = post(
+            "/bot/batch",
+            {
+                "operations": [
+                    {"path": "/room/info", "body": {"user_id": 1}},
+                    {"path": "/test/fail", "body": {}},
+                    {"path": "/rule/list", "body": {"user_id": 1}},
+                ],
+                "atomic": atomic,
+            },
+        )
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [res["status_code"] for res in results] == ([200, 500] if atomic else [200, 500, 200])
+    assert results[1]["error"] == "Internal Server Error"
+    async with session_maker.get_session() as db:
+        assert list(await db.scalars(select(Rule.name).where(Rule.room_id == 1))) == ["rule1"]
+
+
+def test_batch_atomic_daily_info():
+    *_, manual = setup_some_tasks()
+    order_id = post("/bot/manual_task/info", {"user_id": 1001, "task_id": manual}).json()["order_id"]
+    # the response is cached before the batch
+    assert len(post("/bot/room/daily_info", {"user_id": 1001}).json()["manual_tasks"]) == 1
+    r = post(
+        "/bot/batch",
+        {
+            "operations": [
+                {
+                    "path": "/manual_task/create",
+                    "body": {"user_id": 1001, "task": {"name": "new", "order_id": order_id}},
+                },
+                {"path": "/room/daily_info", "body": {"user_id": 1001}},
+            ],
+            "atomic": True,
+        },
+    )
+    (created, daily_info) = r.json()["results"]
+    assert created["status_code"] == 200 and daily_info["status_code"] == 200
+    assert {task["id"] for task in daily_info["result"]["manual_tasks"]} == {manual, created["result"]}
+
+
+def test_batch_no_token():
+    r = client.post("/bot/batch", json={"operations": [{"path": "/room/info", "body": {"user_id": 1}}]})
+    assert r.status_code == 401 and r.json()["code"] == 1
@@ -0,0 +1,69 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.api.utils import coalesce_by_room
+from src.cache import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_singleflight_coalesces_concurrent_calls():
+    single_flight = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        number = calls
+        await release.wait()
+        return number
+
+    tasks = [asyncio.create_task(single_flight.do("key", compute)) for _ in range(3)]
+    other = asyncio.create_task(single_flight.do("other", compute))
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*tasks) == [1, 1, 1]
+    assert await other == 2
+    assert single_flight.stats() == {"in_flight": 0, "calls": 2, "coalesced": 2}
+
+    # finished computations are not reused
+    assert await single_flight.do("key", compute) == 3
+
+
+@pytest.mark.asyncio
+async def test_singleflight_shares_errors():
+    single_flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fail():
+        await release.wait()
+        raise ValueError()
+
+    tasks = [asyncio.create_task(single_flight.do("key", fail)) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert single_flight.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_coalesce_by_room_versions():
+    release = asyncio.Event()
+
+    @coalesce_by_room
+    async def read_room(room, db):
+        await release.wait()
+        return room.version
+
+    def call(version: int):
+        room, db = SimpleNamespace(id=1, version=version), SimpleNamespace(info={})
+        return asyncio.create_task(read_room(room=room, db=db))
+
+    tasks = [call(1), call(1), call(2)]
+    await asyncio.sleep(0)
+    release.set()
+    # the read of the room's new version does not join the computation for the previous one
+    assert await asyncio.gather(*tasks) == [1, 1, 2]
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import TimeoutError
+
+from src.db_sessions.sqlalchemy_session import SqlAlchemySessionMaker
+
+
+def test_import_models_without_database():
+    # the settings of the database are not available, so any attempt to configure it would fail
+    env = {k: v for k, v in os.environ.items() if not k.startswith("DB_")}
+    code = "import sys, src.models.sql; assert not any(name.startswith('src.db_sessions') for name in sys.modules)"
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
+
+
+@pytest.mark.asyncio
+async def test_engine_lifecycle():
+    session_maker = SqlAlchemySessionMaker()
+    session_maker.start()
+    engine = session_maker.engine
+    await session_maker.prewarm(3)
+    assert engine.pool.checkedin() == 3
+
+    await session_maker.dispose()
+    assert engine.pool.checkedin() == 0
+    # the engine is created again on first use
+    async with session_maker.get_session() as db:
+        assert await db.scalar(select(1)) == 1
+    assert session_maker.engine is not engine
+    await session_maker.dispose()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_session():
+    session_maker = SqlAlchemySessionMaker()
+    try:
+        async with session_maker.get_snapshot_session() as db:
+            assert await db.scalar(text("SHOW transaction_isolation")) == "repeatable read"
+        async with session_maker.get_session() as db:
+            assert await db.scalar(text("SHOW transaction_isolation")) == "read committed"
+    finally:
+        await session_maker.dispose()
+
+
+@pytest.mark.asyncio
+async def test_pool_stats():
+    session_maker = SqlAlchemySessionMaker()
+    session_maker.start(pool_size=1, max_overflow=1, pool_timeout=0.1)
+    engine = session_maker.engine
+    try:
+        async with engine.connect() as first, engine.connect() as second:
+            await first.execute(select(1))
+            await second.execute(select(1))
+            stats = session_maker.pool_stats()
+            assert stats["in_use"] == 2 and stats["overflow"] == 1 and stats["max_overflow_used"] == 1
+            with pytest.raises(TimeoutError):
+                await engine.connect().start()
+
+        stats = session_maker.pool_stats()
+        assert stats["in_use"] == 0 and stats["overflow"] == 0 and stats["idle"] == 1
+        assert stats["checkouts"] == 2 and stats["timeouts"] == 1 and stats["max_wait_time"] >= 0.1
+    finally:
+        await session_maker.dispose()